@@ -0,0 +1,66 @@
+import os
+
+from google.adk.agents import Agent
+
+from .intent_router import IntentRouter, make_routing_callback
+from .state_concurrency import sync_student_state
+from .sub_agents.adaptive_learning_agent import adaptive_learning_agent
+from .sub_agents.content_curator_agent import content_curator_agent
+from .sub_agents.feedback_agent import feedback_agent
+from .sub_agents.goal_setting_agent import goal_setting_agent
+from .sub_agents.learning_pattern_agent import learning_pattern_agent
+
+# Use a router trained from logged routes when available, keyword rules otherwise
+router_model_path = os.environ.get("INTENT_ROUTER_MODEL", "")
+if router_model_path and os.path.exists(router_model_path):
+    intent_router = IntentRouter.load(router_model_path)
+else:
+    intent_router = IntentRouter()
+
+# Create the root learning assistant agent
+root_agent = Agent(
+    name="learning_assistant",
+    model="gemini-2.0-flash",
+    description="Learning assistant that routes students to specialized personalized learning agents",
+    instruction="""
+    You are the Learning Assistant for the Personalized Learning Platform.
+    Your role is to understand what the student needs and delegate to the most appropriate specialized agent.
+
+    <student_info>
+    Name: {student_name}
+    Subject Interests: {subject_interests}
+    Learning Style: {learning_style}
+    </student_info>
+
+    Available agents:
+
+    1. goal_setting
+       - Creating new learning goals and tracking progress on existing goals
+
+    2. content_curator
+       - Recommending courses, resources and learning paths, and saving resources
+
+    3. feedback
+       - Collecting feedback on courses, resources and recommendations
+
+    4. adaptive_learning
+       - Adjusting content difficulty and learning pace
+
+    5. learning_pattern_analyzer
+       - Analyzing performance, engagement and learning patterns
+
+    When routing:
+    - Delegate to the single agent that best matches the student's request
+    - Ask a short clarifying question if the request is ambiguous
+    - Answer simple greetings directly without delegating
+    """,
+    sub_agents=[
+        goal_setting_agent,
+        content_curator_agent,
+        feedback_agent,
+        adaptive_learning_agent,
+        learning_pattern_agent,
+    ],
+    # Obvious intents are routed locally and skip the LLM delegation call
+    before_model_callback=[sync_student_state, make_routing_callback(intent_router)],
+)
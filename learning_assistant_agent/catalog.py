@@ -0,0 +1,112 @@
+# Courses and external resources in the content curator's library, with the
+# subjects each one covers. The curator prompt and goal progress both read this.
+COURSE_CATALOG = [
+    {
+        "id": "python_intro",
+        "title": "Introduction to Python Programming",
+        "type": "course",
+        "details": ["Beginner level", "Video lectures, coding exercises, quizzes", "20 hours total length"],
+        "subjects": ["python", "programming"],
+    },
+    {
+        "id": "data_science_101",
+        "title": "Data Science Fundamentals",
+        "type": "course",
+        "details": ["Intermediate level", "Interactive notebooks, projects, assessments", "30 hours total length"],
+        "subjects": ["data science", "python", "statistics"],
+    },
+    {
+        "id": "ml_basics",
+        "title": "Machine Learning Basics",
+        "type": "course",
+        "details": [
+            "Intermediate level",
+            "Video tutorials, programming assignments, case studies",
+            "40 hours total length",
+        ],
+        "subjects": ["machine learning", "data science", "python"],
+    },
+    {
+        "id": "web_dev_js",
+        "title": "Web Development with JavaScript",
+        "type": "course",
+        "details": ["Beginner level", "Interactive tutorials, project-based learning", "25 hours total length"],
+        "subjects": ["web development", "javascript", "programming"],
+    },
+    {
+        "id": "adv_math_cs",
+        "title": "Advanced Mathematics for CS",
+        "type": "course",
+        "details": ["Advanced level", "Problem sets, video lectures, practice tests", "35 hours total length"],
+        "subjects": ["mathematics", "algorithms", "computer science"],
+    },
+    {
+        "id": "cs50_harvard",
+        "title": "CS50 Harvard Online Course",
+        "type": "external",
+        "details": ["Comprehensive introduction to computer science", "Video lectures, assignments, forums"],
+        "url": "https://cs50.harvard.edu/",
+        "subjects": ["computer science", "programming", "algorithms"],
+    },
+    {
+        "id": "kaggle_comp",
+        "title": "Kaggle Competitions",
+        "type": "external",
+        "details": ["Real-world data science challenges", "Datasets, community solutions, forums"],
+        "url": "https://www.kaggle.com/competitions",
+        "subjects": ["data science", "machine learning"],
+    },
+    {
+        "id": "mit_ocw",
+        "title": "MIT OpenCourseWare",
+        "type": "external",
+        "details": ["Free lecture notes, exams, and videos", "Various CS and mathematics topics"],
+        "url": "https://ocw.mit.edu/",
+        "subjects": ["computer science", "mathematics"],
+    },
+    {
+        "id": "freecodecamp",
+        "title": "freeCodeCamp",
+        "type": "external",
+        "details": ["Interactive coding challenges and projects", "Certification paths available"],
+        "url": "https://www.freecodecamp.org/",
+        "subjects": ["web development", "javascript", "programming"],
+    },
+    {
+        "id": "khan_academy",
+        "title": "Khan Academy",
+        "type": "external",
+        "details": ["Video tutorials and practice exercises", "Strong focus on mathematics fundamentals"],
+        "url": "https://www.khanacademy.org/",
+        "subjects": ["mathematics"],
+    },
+]
+
+# Subjects covered by each catalog item, keyed by item ID
+CATALOG_SUBJECTS = {item["id"]: item["subjects"] for item in COURSE_CATALOG}
+
+
+def format_content_library(indent: str = "    ") -> str:
+    """
+    Renders the catalog as the numbered course and resource lists used in agent prompts.
+    """
+    sections = []
+    for item_type, heading in (("course", "Available Courses:"), ("external", "External Resources:")):
+        entries = []
+        items = [item for item in COURSE_CATALOG if item["type"] == item_type]
+        for number, item in enumerate(items, start=1):
+            lines = [f"{indent}{number}. {item['title']} (ID: {item['id']})"]
+            lines.extend(f"{indent}   - {detail}" for detail in item["details"])
+            if item.get("url"):
+                lines.append(f"{indent}   - URL: {item['url']}")
+            entries.append("\n".join(lines))
+        sections.append(f"{indent}{heading}\n" + "\n\n".join(entries))
+    return "\n\n".join(sections) + "\n"
+
+
+def format_catalog_subjects(indent: str = "    ") -> str:
+    """
+    Renders the catalog item IDs and subjects that goal progress can be derived from.
+    """
+    subjects = sorted({subject for item_subjects in CATALOG_SUBJECTS.values() for subject in item_subjects})
+    return f"{indent}Course IDs: {', '.join(CATALOG_SUBJECTS)}\n{indent}Subjects: {', '.join(subjects)}\n"
@@ -0,0 +1,400 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Snapshot layout: a manifest.json that holds the student index, the string
+# dictionaries, per-session fingerprints and the current generation, plus one
+# directory per generation with one .npy file per table column. Each update
+# writes a new generation and publishes it by replacing the manifest.
+MANIFEST_FILE = "manifest.json"
+
+# Generations kept besides the current one, for readers still on an older manifest
+KEEP_GENERATIONS = 1
+
+# Columns of each fact table. String columns are dictionary-encoded into int32
+# codes; the "student" column is the row index into the manifest's student list.
+TABLES = {
+    "quiz_results": {"student": np.int32, "course": np.int32, "score": np.float32},
+    "goals": {"student": np.int32, "type": np.int32, "status": np.int32, "progress": np.float32},
+    "feedback": {"student": np.int32, "item": np.int32, "type": np.int32, "rating": np.float32},
+}
+
+# Columns whose codes are looked up in a shared string dictionary
+VOCAB_COLUMNS = {
+    ("quiz_results", "course"): "course",
+    ("goals", "type"): "goal_type",
+    ("goals", "status"): "goal_status",
+    ("feedback", "item"): "item",
+    ("feedback", "type"): "feedback_type",
+}
+
+
+def _fingerprint(state: dict) -> str:
+    """
+    Returns a stable hash of the parts of a student state the snapshot reads.
+    """
+    relevant = {key: state.get(key) for key in ("quiz_results", "learning_goals", "feedback_list")}
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _quiz_rows(quiz_results) -> list:
+    """
+    Normalizes quiz_results into (course, score) pairs.
+    Accepts a list of result dicts or a dict keyed by course/quiz ID.
+    """
+    rows = []
+    if isinstance(quiz_results, dict):
+        items = []
+        for key, value in quiz_results.items():
+            if isinstance(value, dict):
+                items.append({"course_id": key, **value})
+            else:
+                items.append({"course_id": key, "score": value})
+    elif isinstance(quiz_results, list):
+        items = quiz_results
+    else:
+        items = []
+
+    for result in items:
+        if not isinstance(result, dict):
+            continue
+        course = result.get("course_id") or result.get("quiz_id") or result.get("topic") or ""
+        score = result.get("score", result.get("percentage"))
+        if isinstance(score, (int, float)):
+            rows.append((str(course), float(score)))
+    return rows
+
+
+def _number(value):
+    """
+    Returns a numeric field as a float, 0 when missing, or None when it is not
+    a number (e.g. a model-supplied "50%").
+    """
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _extract_rows(state: dict) -> dict:
+    """
+    Converts one student state into raw (still string-valued) table rows.
+    Goals and feedback with a non-numeric progress or rating are skipped.
+    """
+    goals = []
+    for goal in state.get("learning_goals", []):
+        progress = _number(goal.get("progress")) if isinstance(goal, dict) else None
+        if progress is not None:
+            goals.append((str(goal.get("type", "")), str(goal.get("status", "")), progress))
+    feedback = []
+    for item in state.get("feedback_list", []):
+        rating = _number(item.get("rating")) if isinstance(item, dict) else None
+        if rating is not None:
+            feedback.append((str(item.get("item_id", "")), str(item.get("type", "")), rating))
+    return {
+        "quiz_results": _quiz_rows(state.get("quiz_results", [])),
+        "goals": goals,
+        "feedback": feedback,
+    }
+
+
+def _encode(value: str, vocab: list, lookup: dict) -> int:
+    """
+    Returns the dictionary code for a string, appending it if unseen.
+    """
+    code = lookup.get(value)
+    if code is None:
+        code = len(vocab)
+        vocab.append(value)
+        lookup[value] = code
+    return code
+
+
+def _generation_dir(snapshot_dir: str, manifest: dict) -> str:
+    # Snapshots written before generations existed keep their columns at the top level
+    generation = manifest.get("generation")
+    return os.path.join(snapshot_dir, generation) if generation else snapshot_dir
+
+
+def _column_path(generation_dir: str, table: str, column: str) -> str:
+    return os.path.join(generation_dir, f"{table}.{column}.npy")
+
+
+def _read_manifest(snapshot_dir: str) -> dict:
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {
+            "students": [],
+            "fingerprints": {},
+            "vocab": {name: [] for name in set(VOCAB_COLUMNS.values())},
+        }
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _remove_old_generations(snapshot_dir: str, generation_number: int) -> None:
+    """
+    Deletes generation directories older than the ones readers may still use.
+    """
+    for name in os.listdir(snapshot_dir):
+        if not name.startswith("gen-"):
+            continue
+        try:
+            number = int(name[len("gen-"):])
+        except ValueError:
+            continue
+        if number < generation_number - KEEP_GENERATIONS:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def update_snapshot(snapshot_dir: str, sessions, removed_sessions=(), full: bool = False) -> dict:
+    """
+    Creates or incrementally updates a columnar cohort snapshot.
+
+    sessions is an iterable of (session_id, state) pairs. Only sessions whose
+    relevant state changed since the last run are re-encoded; their old rows
+    are dropped and replaced, all other rows are carried over untouched.
+
+    Rows of sessions listed in removed_sessions are dropped. With full=True,
+    sessions is the whole cohort and every known session missing from it is
+    dropped as well. A dropped session's slot in the student list becomes None.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = _read_manifest(snapshot_dir)
+    student_index = {
+        session_id: i for i, session_id in enumerate(manifest["students"]) if session_id is not None
+    }
+    lookups = {
+        name: {value: code for code, value in enumerate(values)}
+        for name, values in manifest["vocab"].items()
+    }
+
+    # Encode the rows of changed sessions only
+    changed = []
+    seen = set()
+    removed = set(removed_sessions)
+    new_rows = {table: {column: [] for column in columns} for table, columns in TABLES.items()}
+    for session_id, state in sessions:
+        seen.add(session_id)
+        if session_id in removed:
+            continue
+        fingerprint = _fingerprint(state)
+        if manifest["fingerprints"].get(session_id) == fingerprint:
+            continue
+        if session_id not in student_index:
+            student_index[session_id] = len(manifest["students"])
+            manifest["students"].append(session_id)
+        student = student_index[session_id]
+        manifest["fingerprints"][session_id] = fingerprint
+        changed.append(student)
+
+        for table, rows in _extract_rows(state).items():
+            columns = [column for column in TABLES[table] if column != "student"]
+            for row in rows:
+                new_rows[table]["student"].append(student)
+                for column, value in zip(columns, row):
+                    vocab_name = VOCAB_COLUMNS.get((table, column))
+                    if vocab_name:
+                        value = _encode(value, manifest["vocab"][vocab_name], lookups[vocab_name])
+                    new_rows[table][column].append(value)
+
+    # Drop removed sessions; their rows go with the changed students below
+    if full:
+        removed.update(session_id for session_id in student_index if session_id not in seen)
+    removed_count = 0
+    for session_id in removed:
+        student = student_index.pop(session_id, None)
+        if student is None:
+            continue
+        manifest["students"][student] = None
+        manifest["fingerprints"].pop(session_id, None)
+        changed.append(student)
+        removed_count += 1
+
+    if changed:
+        # Every column is written into a fresh generation directory, so readers
+        # and crashes never mix columns of different lengths
+        old_dir = _generation_dir(snapshot_dir, manifest)
+        generation_number = manifest.get("generation_number", 0) + 1
+        manifest["generation"] = f"gen-{generation_number:06d}"
+        manifest["generation_number"] = generation_number
+        new_dir = _generation_dir(snapshot_dir, manifest)
+        shutil.rmtree(new_dir, ignore_errors=True)
+        os.makedirs(new_dir)
+
+        changed_students = np.asarray(changed, dtype=np.int32)
+        for table, columns in TABLES.items():
+            student_path = _column_path(old_dir, table, "student")
+            if os.path.exists(student_path):
+                keep = ~np.isin(np.load(student_path), changed_students)
+            else:
+                keep = None
+            for column, dtype in columns.items():
+                appended = np.asarray(new_rows[table][column], dtype=dtype)
+                if keep is not None:
+                    merged = np.concatenate([np.load(_column_path(old_dir, table, column))[keep], appended])
+                else:
+                    merged = appended
+                np.save(_column_path(new_dir, table, column), merged)
+
+        # Replacing the manifest publishes the new generation in one step
+        manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        _remove_old_generations(snapshot_dir, generation_number)
+
+    return {
+        "status": "success",
+        "students": len(student_index),
+        "updated_students": len(changed) - removed_count,
+        "removed_students": removed_count,
+    }
+
+
+class CohortSnapshot:
+    """
+    Read-only, memory-mapped view of a cohort snapshot with group-by queries.
+    """
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = snapshot_dir
+        self.manifest = _read_manifest(snapshot_dir)
+        self.students = self.manifest["students"]
+        generation_dir = _generation_dir(snapshot_dir, self.manifest)
+        self.tables = {}
+        for table, columns in TABLES.items():
+            self.tables[table] = {}
+            for column, dtype in columns.items():
+                path = _column_path(generation_dir, table, column)
+                if os.path.exists(path):
+                    self.tables[table][column] = np.load(path, mmap_mode="r")
+                else:
+                    self.tables[table][column] = np.empty(0, dtype=dtype)
+
+    def labels(self, table: str, column: str) -> list:
+        """
+        Returns the decoded labels for a grouping column.
+        """
+        if column == "student":
+            return self.students
+        return self.manifest["vocab"][VOCAB_COLUMNS[(table, column)]]
+
+    def _mask(self, table: str, where: dict, mask=None):
+        """
+        Builds a row mask from {column: label} equality filters.
+        """
+        if not where:
+            return mask
+        columns = self.tables[table]
+        if mask is None:
+            mask = np.ones(len(columns["student"]), dtype=bool)
+        else:
+            mask = np.array(mask, dtype=bool)
+        for column, label in where.items():
+            labels = self.labels(table, column)
+            code = labels.index(label) if label in labels else -1
+            mask &= np.asarray(columns[column]) == code
+        return mask
+
+    def aggregate(self, table: str, value: str = None, by: str = None, agg: str = "mean",
+                  where: dict = None, values=None, mask=None) -> dict:
+        """
+        Groups rows of a table by a column and aggregates a numeric column.
+
+        agg is one of "mean", "sum", "count", "min" or "max". values may be a
+        precomputed array (e.g. a boolean indicator) used instead of a column,
+        and mask an optional boolean row filter applied on top of where.
+        Returns {label: aggregate}; with by=None the key is "all".
+        """
+        columns = self.tables[table]
+        if values is None:
+            values = columns[value] if value else np.ones(len(columns["student"]), dtype=np.float32)
+        values = np.asarray(values, dtype=np.float64)
+        mask = self._mask(table, where, mask)
+
+        if by is None:
+            codes = np.zeros(len(values), dtype=np.int64)
+            labels = ["all"]
+        else:
+            codes = np.asarray(columns[by], dtype=np.int64)
+            labels = self.labels(table, by)
+        if mask is not None:
+            codes, values = codes[mask], values[mask]
+
+        counts = np.bincount(codes, minlength=len(labels))
+        if agg == "count":
+            result = counts
+        elif agg in ("sum", "mean"):
+            result = np.bincount(codes, weights=values, minlength=len(labels))
+            if agg == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = result / counts
+        elif agg in ("min", "max"):
+            # Sort by group, then reduce each contiguous run of equal codes
+            order = np.argsort(codes, kind="stable")
+            sorted_codes, sorted_values = codes[order], values[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else []
+            reducer = np.minimum if agg == "min" else np.maximum
+            result = np.full(len(labels), np.nan)
+            if len(starts):
+                result[sorted_codes[starts]] = reducer.reduceat(sorted_values, starts)
+        else:
+            raise ValueError(f"Unsupported aggregate: {agg}")
+
+        return {
+            labels[code]: float(result[code])
+            for code in range(len(labels))
+            if counts[code] > 0
+        }
+
+    def top(self, table: str, value: str, by: str, n: int = 10, agg: str = "mean",
+            min_count: int = 1, where: dict = None, mask=None) -> list:
+        """
+        Returns the n groups with the highest aggregate as (label, value, count).
+        """
+        aggregated = self.aggregate(table, value, by=by, agg=agg, where=where, mask=mask)
+        counts = self.aggregate(table, None, by=by, agg="count", where=where, mask=mask)
+        ranked = [
+            (label, score, int(counts[label]))
+            for label, score in aggregated.items()
+            if counts[label] >= min_count
+        ]
+        ranked.sort(key=lambda row: row[1], reverse=True)
+        return ranked[:n]
+
+
+def average_quiz_score_by_course(snapshot: CohortSnapshot) -> dict:
+    """
+    Returns the cohort's average quiz score for each course.
+    """
+    return snapshot.aggregate("quiz_results", "score", by="course", agg="mean")
+
+
+def goal_completion_rate(snapshot: CohortSnapshot, by: str = "type") -> dict:
+    """
+    Returns the fraction of goals marked completed, grouped by goal type.
+    """
+    status_labels = snapshot.labels("goals", "status")
+    completed_code = status_labels.index("completed") if "completed" in status_labels else -1
+    completed = np.asarray(snapshot.tables["goals"]["status"]) == completed_code
+    return snapshot.aggregate("goals", by=by, agg="mean", values=completed)
+
+
+def top_rated_resources(snapshot: CohortSnapshot, n: int = 10, min_ratings: int = 1,
+                        feedback_type: str = None) -> list:
+    """
+    Returns the n best-rated items from feedback_list as (item_id, avg_rating, count).
+    """
+    where = {"type": feedback_type} if feedback_type else None
+    # A rating of 0 is the submit_feedback default and means "not rated"
+    rated = np.asarray(snapshot.tables["feedback"]["rating"]) > 0
+    ranked = snapshot.top("feedback", "rating", by="item", n=n + 1, min_count=min_ratings,
+                          where=where, mask=rated)
+    # Feedback without an item_id is general feedback, not a resource rating
+    return [row for row in ranked if row[0]][:n]
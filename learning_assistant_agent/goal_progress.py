@@ -0,0 +1,393 @@
+import copy
+from datetime import datetime
+
+from google.adk.events import Event, EventActions
+
+from .catalog import CATALOG_SUBJECTS
+from .state_concurrency import (
+    MERGEABLE_KEYS,
+    STATE_VERSIONS_KEY,
+    VersionedStateStore,
+    session_state_store,
+    store_key,
+    sync_state,
+)
+
+
+def _normalize(subject) -> str:
+    return str(subject).strip().lower()
+
+
+def _build_subject_courses() -> dict:
+    """
+    Maps every subject key to the catalog items that cover it. A goal's
+    related_subjects may name a subject or a catalog item ID, so each item ID
+    is also a subject key covered by the item itself.
+    """
+    subject_courses = {}
+    for course_id, subjects in CATALOG_SUBJECTS.items():
+        subject_courses.setdefault(course_id, set()).add(course_id)
+        for subject in subjects:
+            subject_courses.setdefault(_normalize(subject), set()).add(course_id)
+    return subject_courses
+
+
+SUBJECT_COURSES = _build_subject_courses()
+
+
+def subject_mastery(state, subject: str, subject_quiz_scores: dict = None) -> float:
+    """
+    Returns 0-100 mastery of a subject key for a student.
+
+    Mastery is the higher of the share of covering catalog items the student
+    has completed and their average quiz score on the subject.
+    """
+    if subject_quiz_scores is None:
+        subject_quiz_scores = _subject_quiz_scores(state)
+    subject = _normalize(subject)
+    covering_courses = SUBJECT_COURSES.get(subject, set())
+    course_mastery = 0.0
+    if covering_courses:
+        completed = set(state.get("completed_courses", [])) & covering_courses
+        course_mastery = 100 * len(completed) / len(covering_courses)
+
+    quiz_scores = subject_quiz_scores.get(subject)
+    quiz_mastery = 0.0
+    if quiz_scores and quiz_scores.get("count"):
+        quiz_mastery = quiz_scores["total"] / quiz_scores["count"]
+
+    return max(course_mastery, quiz_mastery)
+
+
+def derive_goal_progress(state, goal: dict):
+    """
+    Returns a goal's progress derived from its related subjects, or None if
+    none of them resolves. A subject resolves when it is a catalog item ID,
+    a catalog subject or a topic the student has quiz scores for; only
+    resolved subjects are averaged.
+    """
+    subject_quiz_scores = _subject_quiz_scores(state)
+    subjects = [
+        subject for subject in {_normalize(subject) for subject in goal.get("related_subjects", []) if subject}
+        if subject in SUBJECT_COURSES or subject in subject_quiz_scores
+    ]
+    if not subjects:
+        return None
+    return int(round(
+        sum(subject_mastery(state, subject, subject_quiz_scores) for subject in subjects) / len(subjects)
+    ))
+
+
+def _apply_progress(goal: dict, progress: int, current_time: str) -> dict:
+    """
+    Returns a copy of the goal with the derived progress applied.
+    """
+    updated_goal = goal.copy()
+    updated_goal["progress"] = min(progress, 100)
+    updated_goal["progress_source"] = "derived"
+
+    # If progress is 100%, mark as completed
+    if progress >= 100:
+        updated_goal["status"] = "completed"
+        updated_goal["completion_date"] = current_time
+    return updated_goal
+
+
+def register_goal(state, goal: dict) -> dict:
+    """
+    Adds a new goal to the subject-to-goal index.
+    Returns the goal with its initial progress derived from current mastery.
+    """
+    subjects = {_normalize(subject) for subject in goal.get("related_subjects", []) if subject}
+    if not subjects:
+        return goal
+
+    goal_index = {subject: list(goal_ids) for subject, goal_ids in state.get("goal_subject_index", {}).items()}
+    for subject in subjects:
+        if goal["id"] not in goal_index.setdefault(subject, []):
+            goal_index[subject].append(goal["id"])
+    state["goal_subject_index"] = goal_index
+
+    progress = derive_goal_progress(state, goal)
+    if progress is not None:
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return _apply_progress(goal, progress, current_time)
+    return goal
+
+
+def rebuild_goal_index(state) -> dict:
+    """
+    Rebuilds the subject-to-goal index from all learning goals, e.g. for
+    sessions created before the index existed.
+    """
+    goal_index = {}
+    for goal in state.get("learning_goals", []):
+        if not isinstance(goal, dict):
+            continue
+        for subject in {_normalize(subject) for subject in goal.get("related_subjects", []) if subject}:
+            goal_index.setdefault(subject, []).append(goal["id"])
+    state["goal_subject_index"] = goal_index
+    return goal_index
+
+
+def _refresh_goals(state, subjects: set, current_time: str) -> list:
+    """
+    Recomputes progress only for active goals linked to the given subjects.
+    Returns the IDs of goals whose progress changed.
+    """
+    goal_index = state.get("goal_subject_index", {})
+    affected_ids = set()
+    for subject in subjects:
+        affected_ids.update(goal_index.get(subject, []))
+    if not affected_ids:
+        return []
+
+    updated_ids = []
+    new_goals = []
+    for goal in state.get("learning_goals", []):
+        if isinstance(goal, dict) and goal.get("id") in affected_ids and goal.get("status") == "active":
+            progress = derive_goal_progress(state, goal)
+            if progress is not None and progress != goal.get("progress"):
+                goal = _apply_progress(goal, progress, current_time)
+                updated_ids.append(goal["id"])
+        new_goals.append(goal)
+
+    if updated_ids:
+        state["learning_goals"] = new_goals
+    return updated_ids
+
+
+def _record_interaction(state, entry: dict) -> None:
+    current_interaction_history = state.get("interaction_history", [])
+    new_interaction_history = current_interaction_history.copy()
+    new_interaction_history.append(entry)
+    state["interaction_history"] = new_interaction_history
+
+
+def _quiz_result_list(quiz_results) -> list:
+    """
+    Returns quiz results as a list of result dicts.
+    Older sessions store them as a dict keyed by course ID, e.g. {"ml_basics": 80}.
+    """
+    if isinstance(quiz_results, list):
+        return quiz_results.copy()
+    if not isinstance(quiz_results, dict):
+        return []
+
+    converted = []
+    for course_id, value in quiz_results.items():
+        result = {"quiz_id": "", "course_id": course_id, "topic": "", "score": value, "timestamp": ""}
+        if isinstance(value, dict):
+            result.update(value)
+        converted.append(result)
+    return converted
+
+
+def _subjects_for(course_id: str = "", topic: str = "") -> set:
+    subjects = set()
+    if course_id:
+        subjects.add(_normalize(course_id))
+        subjects.update(_normalize(subject) for subject in CATALOG_SUBJECTS.get(course_id, []))
+    if topic:
+        subjects.add(_normalize(topic))
+    return subjects
+
+
+def _result_score(result: dict):
+    """
+    Returns a stored quiz result's numeric score, or None. Older results may
+    keep it under "percentage".
+    """
+    for field in ("score", "percentage"):
+        value = result.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def _add_quiz_score(subject_quiz_scores: dict, subjects: set, score) -> None:
+    for subject in subjects:
+        scores = subject_quiz_scores.get(subject, {"total": 0, "count": 0})
+        subject_quiz_scores[subject] = {"total": scores["total"] + score, "count": scores["count"] + 1}
+
+
+def _subject_quiz_scores(state) -> dict:
+    """
+    Returns a copy of the running quiz averages per subject. Sessions whose
+    quiz results predate the averages get them built from all stored results.
+    """
+    if "subject_quiz_scores" in state:
+        return state["subject_quiz_scores"].copy()
+
+    subject_quiz_scores = {}
+    for result in _quiz_result_list(state.get("quiz_results", [])):
+        if not isinstance(result, dict):
+            continue
+        score = _result_score(result)
+        if score is not None:
+            _add_quiz_score(
+                subject_quiz_scores,
+                _subjects_for(result.get("course_id", ""), result.get("topic", "")),
+                score,
+            )
+    return subject_quiz_scores
+
+
+def record_quiz_result(state, result: dict) -> dict:
+    """
+    Records a quiz result and updates progress of the goals it affects.
+
+    result has a "score" (0-100) and a "course_id" and/or "topic". The score
+    counts towards the course's ID, its catalog subjects and the topic.
+    """
+    course_id = result.get("course_id", "")
+    topic = result.get("topic", "")
+    score = result.get("score")
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    if not isinstance(score, (int, float)):
+        return {"status": "error", "message": "Quiz result must include a numeric score"}
+
+    subjects = _subjects_for(course_id, topic)
+    if not subjects:
+        return {"status": "error", "message": "Quiz result must include a course_id or topic"}
+
+    # Built from earlier results first, so they count towards the averages too
+    subject_quiz_scores = _subject_quiz_scores(state)
+    new_quiz_results = _quiz_result_list(state.get("quiz_results", []))
+
+    # Store the raw result
+    new_quiz_results.append({
+        "quiz_id": result.get("quiz_id", ""),
+        "course_id": course_id,
+        "topic": topic,
+        "score": score,
+        "timestamp": current_time,
+    })
+    state["quiz_results"] = new_quiz_results
+
+    # Update running quiz averages for the affected subjects
+    _add_quiz_score(subject_quiz_scores, subjects, score)
+    state["subject_quiz_scores"] = subject_quiz_scores
+
+    updated_goals = _refresh_goals(state, subjects, current_time)
+    _record_interaction(state, {
+        "action": "record_quiz_result",
+        "course_id": course_id,
+        "topic": topic,
+        "score": score,
+        "updated_goals": updated_goals,
+        "timestamp": current_time,
+    })
+
+    return {
+        "status": "success",
+        "message": f"Recorded quiz result and updated {len(updated_goals)} goal(s)",
+        "updated_goals": updated_goals,
+        "timestamp": current_time,
+    }
+
+
+def record_course_completion(state, course_id: str) -> dict:
+    """
+    Marks a course as completed and updates progress of the goals it affects.
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    completed_courses = state.get("completed_courses", [])
+    if course_id in completed_courses:
+        return {"status": "error", "message": f"Course {course_id} is already completed"}
+
+    state["completed_courses"] = completed_courses + [course_id]
+    current_courses = state.get("current_courses", [])
+    if course_id in current_courses:
+        state["current_courses"] = [course for course in current_courses if course != course_id]
+
+    subjects = _subjects_for(course_id)
+
+    updated_goals = _refresh_goals(state, subjects, current_time)
+    _record_interaction(state, {
+        "action": "complete_course",
+        "course_id": course_id,
+        "updated_goals": updated_goals,
+        "timestamp": current_time,
+    })
+
+    return {
+        "status": "success",
+        "message": f"Recorded completion of {course_id} and updated {len(updated_goals)} goal(s)",
+        "course_id": course_id,
+        "updated_goals": updated_goals,
+        "timestamp": current_time,
+    }
+
+
+def apply_learning_event(state, event: dict) -> dict:
+    """
+    Applies a platform learning event ("quiz_result" or "course_completion") to a state dict.
+    This is the pure step; sessions should use commit_learning_event or ingest_learning_event.
+    """
+    event_type = event.get("type")
+    if event_type == "quiz_result":
+        return record_quiz_result(state, event)
+    if event_type == "course_completion":
+        return record_course_completion(state, event.get("course_id", ""))
+    return {"status": "error", "message": f"Unknown learning event type: {event_type}"}
+
+
+def commit_learning_event(session_key, state, event: dict,
+                          store: VersionedStateStore = session_state_store) -> tuple:
+    """
+    Applies a learning event to a session's state through the shared state store.
+
+    Goals, history and the goal index are committed to the store, so the next
+    sync keeps the derived progress instead of restoring older store values.
+    Returns (result, state_delta); state itself is not modified.
+    """
+    with store.lock_manager.lock(session_key):
+        working_state = copy.deepcopy(dict(state))
+        sync_state(store, session_key, working_state)
+        read_versions = store.versions(session_key)
+
+        result = apply_learning_event(working_state, event)
+        if result["status"] != "success":
+            return result, {}
+
+        written = {
+            key: working_state[key] for key in MERGEABLE_KEYS
+            if key in working_state and working_state[key] != state.get(key)
+        }
+        # The session lock is held since the versions were read, so this cannot conflict
+        working_state.update(store.commit_many(session_key, read_versions, written))
+        versions = store.versions(session_key)
+        working_state[STATE_VERSIONS_KEY] = {
+            **working_state.get(STATE_VERSIONS_KEY, {}),
+            **{key: versions[key] for key in written},
+        }
+
+    state_delta = {
+        key: value for key, value in working_state.items()
+        if key not in state or state[key] != value
+    }
+    return result, state_delta
+
+
+async def ingest_learning_event(session_service, app_name: str, user_id: str, session_id: str,
+                                event: dict) -> dict:
+    """
+    Entry point for learning events reported by the platform (quiz graded,
+    course finished) outside a conversation. Commits the event through the
+    state store and appends the state change to the ADK session. Pass the
+    runner's session service, so an EventStoreSessionService records it too.
+    """
+    session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    if session is None:
+        return {"status": "error", "message": f"Session {session_id} not found"}
+
+    result, state_delta = commit_learning_event(store_key(session), session.state, event)
+    if state_delta:
+        await session_service.append_event(session, Event(
+            author="learning_events",
+            actions=EventActions(state_delta=state_delta),
+        ))
+    return result
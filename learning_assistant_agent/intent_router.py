@@ -0,0 +1,334 @@
+import json
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+# Keyword phrases that strongly signal which sub-agent should handle a message.
+# Each phrase hit also becomes a feature for the trained model.
+INTENT_KEYWORDS = {
+    "goal_setting": [
+        "goal", "goals", "target date", "milestone", "objective", "my progress",
+        "update progress", "achieve", "deadline",
+    ],
+    "content_curator": [
+        "recommend", "recommendation for", "resource", "resources", "course on",
+        "what should i learn", "learning path", "save this", "suggest a course",
+        "tutorial",
+    ],
+    "feedback": [
+        "feedback", "rating", "rate this", "review", "didn't like", "did not like",
+        "was helpful", "not helpful", "complaint",
+    ],
+    "adaptive_learning": [
+        "too hard", "too easy", "too difficult", "difficulty", "slow down",
+        "speed up", "too fast", "too slow", "pace", "harder", "easier",
+    ],
+    "learning_pattern_analyzer": [
+        "how am i doing", "analyze", "analysis", "my performance", "strengths",
+        "weaknesses", "learning pattern", "engagement", "study habits", "trend",
+    ],
+}
+
+# Class for logged routes the root agent answered itself (greetings,
+# clarifying questions). Routes are logged with no agent or the root's name.
+DIRECT_ROUTE = "direct"
+DIRECT_ROUTE_AGENTS = {None, "", DIRECT_ROUTE, "learning_assistant"}
+
+# Routing decisions below this confidence fall back to LLM delegation
+DEFAULT_CONFIDENCE_THRESHOLD = 0.85
+
+# Without a trained model, a route needs at least this many distinct keyword
+# phrases for one agent; a single keyword is too ambiguous to skip the LLM
+MIN_KEYWORD_HITS = 2
+
+
+def _tokenize(message: str) -> list:
+    """
+    Lowercases a message and splits it into word tokens.
+    """
+    return re.findall(r"[a-z0-9']+", message.lower())
+
+
+def _keyword_hits(message: str) -> Counter:
+    """
+    Counts keyword phrase matches per agent for a message.
+    """
+    text = " " + " ".join(_tokenize(message)) + " "
+    hits = Counter()
+    for agent_name, phrases in INTENT_KEYWORDS.items():
+        for phrase in phrases:
+            if f" {phrase} " in text:
+                hits[agent_name] += 1
+    return hits
+
+
+def _features(message: str) -> list:
+    """
+    Builds the feature list for a message: unigrams, bigrams and keyword hits.
+    """
+    tokens = _tokenize(message)
+    features = list(tokens)
+    features.extend(f"{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    for agent_name, count in _keyword_hits(message).items():
+        features.extend([f"kw:{agent_name}"] * count)
+    return features
+
+
+class IntentRouter:
+    """
+    Local intent classifier that picks a sub-agent without an LLM call.
+
+    Uses keyword rules on their own, or a multinomial naive Bayes model over
+    token and keyword features once trained from logged routes. The trained
+    model includes a direct class, so messages the root answers itself are
+    not transferred.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self.class_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.feature_totals = Counter()
+        self.vocabulary = set()
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.class_counts)
+
+    def train(self, logged_routes) -> dict:
+        """
+        Trains the model from logged routes.
+        Each route is a dict with "message" and "agent" keys; routes the root
+        agent answered directly train the direct class.
+        """
+        examples = 0
+        for route in logged_routes:
+            agent_name = route.get("agent")
+            message = route.get("message", "")
+            if agent_name in DIRECT_ROUTE_AGENTS:
+                agent_name = DIRECT_ROUTE
+            if (agent_name not in INTENT_KEYWORDS and agent_name != DIRECT_ROUTE) or not message:
+                continue
+            self.class_counts[agent_name] += 1
+            for feature in _features(message):
+                self.feature_counts[agent_name][feature] += 1
+                self.feature_totals[agent_name] += 1
+                self.vocabulary.add(feature)
+            examples += 1
+
+        return {
+            "status": "success",
+            "examples": examples,
+            "vocabulary_size": len(self.vocabulary),
+        }
+
+    def classify(self, message: str) -> tuple:
+        """
+        Returns (agent_name, confidence) for a message.
+        agent_name is None when nothing in the message signals an intent, or
+        when the trained model's direct class wins.
+        """
+        if not self.trained:
+            hits = _keyword_hits(message)
+            if not hits:
+                return None, 0.0
+            agent_name, best = hits.most_common(1)[0]
+            if best < MIN_KEYWORD_HITS:
+                return agent_name, 0.0
+            return agent_name, best / sum(hits.values())
+
+        features = [feature for feature in _features(message) if feature in self.vocabulary]
+        if not features:
+            return None, 0.0
+
+        total_examples = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary)
+        log_scores = {}
+        for agent_name, class_count in self.class_counts.items():
+            score = math.log(class_count / total_examples)
+            denominator = self.feature_totals[agent_name] + vocabulary_size
+            for feature in features:
+                score += math.log((self.feature_counts[agent_name][feature] + 1) / denominator)
+            log_scores[agent_name] = score
+
+        # Normalize log scores into posterior probabilities
+        best_score = max(log_scores.values())
+        exp_scores = {name: math.exp(score - best_score) for name, score in log_scores.items()}
+        normalizer = sum(exp_scores.values())
+        agent_name = max(exp_scores, key=exp_scores.get)
+        confidence = exp_scores[agent_name] / normalizer
+        if agent_name == DIRECT_ROUTE:
+            return None, confidence
+        return agent_name, confidence
+
+    def route(self, message: str) -> Optional[str]:
+        """
+        Returns the sub-agent name when confident enough, otherwise None.
+        """
+        agent_name, confidence = self.classify(message)
+        if agent_name is None or confidence < self.threshold:
+            return None
+        return agent_name
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "threshold": self.threshold,
+                "class_counts": dict(self.class_counts),
+                "feature_counts": {name: dict(counts) for name, counts in self.feature_counts.items()},
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentRouter":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        router = cls(threshold=data.get("threshold", DEFAULT_CONFIDENCE_THRESHOLD))
+        router.class_counts = Counter(data["class_counts"])
+        for agent_name, counts in data["feature_counts"].items():
+            router.feature_counts[agent_name] = Counter(counts)
+            router.feature_totals[agent_name] = sum(counts.values())
+            router.vocabulary.update(counts)
+        return router
+
+
+def load_logged_routes(path: str) -> list:
+    """
+    Reads logged routes from a JSONL file of {"message", "agent"} records.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _latest_user_message(llm_request: LlmRequest) -> Optional[str]:
+    """
+    Returns the user's text when it is the last content in the request.
+    Function responses and model turns return None so they are never rerouted.
+    """
+    if not llm_request.contents:
+        return None
+    last_content = llm_request.contents[-1]
+    if last_content.role != "user" or not last_content.parts:
+        return None
+    if any(part.function_response for part in last_content.parts):
+        return None
+    text = " ".join(part.text for part in last_content.parts if part.text)
+    return text or None
+
+
+def make_routing_callback(router: IntentRouter):
+    """
+    Creates a before_model_callback for the root agent.
+
+    When the router is confident, the callback answers the model request with a
+    transfer_to_agent call so the delegation hop never reaches the LLM.
+    """
+
+    def route_intent(callback_context: CallbackContext, llm_request: LlmRequest) -> Optional[LlmResponse]:
+        message = _latest_user_message(llm_request)
+        if message is None:
+            return None
+
+        agent_name = router.route(message)
+        if agent_name is None:
+            return None
+
+        # Keep a count of local routing decisions for reporting
+        local_routes = dict(callback_context.state.get("local_routes", {}))
+        local_routes[agent_name] = local_routes.get(agent_name, 0) + 1
+        callback_context.state["local_routes"] = local_routes
+
+        return LlmResponse(
+            content=types.Content(
+                role="model",
+                parts=[
+                    types.Part(
+                        function_call=types.FunctionCall(
+                            name="transfer_to_agent",
+                            args={"agent_name": agent_name},
+                        )
+                    )
+                ],
+            )
+        )
+
+    return route_intent
+
+
+def evaluate_router(router: IntentRouter, replay, llm_routing_latency_ms: float = 800.0,
+                    misroute_penalty_ms: float = None) -> dict:
+    """
+    Replays logged messages through the router and reports accuracy and latency saved.
+
+    Each replay record has "message" and "agent" (the correct route, or no
+    agent when the root answered directly), and may carry "llm_latency_ms"
+    measured for the original LLM delegation call.
+    Only correct local routes save the LLM hop. A misroute costs an extra
+    transfer round trip from the wrong sub-agent (misroute_penalty_ms,
+    defaulting to the LLM routing latency). The router's own time is
+    charged on every message.
+    """
+    total = 0
+    routed_locally = 0
+    correct_locally = 0
+    local_time_ms = 0.0
+    latency_saved_ms = 0.0
+    per_agent = defaultdict(lambda: {"total": 0, "routed": 0, "correct": 0})
+
+    for record in replay:
+        expected = record.get("agent")
+        if expected in DIRECT_ROUTE_AGENTS:
+            expected = DIRECT_ROUTE
+        start = time.perf_counter()
+        agent_name = router.route(record["message"])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        local_time_ms += elapsed_ms
+
+        total += 1
+        per_agent[expected]["total"] += 1
+        llm_latency_ms = record.get("llm_latency_ms", llm_routing_latency_ms)
+        latency_saved_ms -= elapsed_ms
+        if agent_name is None:
+            continue
+        routed_locally += 1
+        per_agent[expected]["routed"] += 1
+        if agent_name == expected:
+            correct_locally += 1
+            per_agent[expected]["correct"] += 1
+            latency_saved_ms += llm_latency_ms
+        else:
+            latency_saved_ms -= llm_latency_ms if misroute_penalty_ms is None else misroute_penalty_ms
+
+    return {
+        "messages": total,
+        "routed_locally": routed_locally,
+        "coverage": routed_locally / total if total else 0.0,
+        "local_accuracy": correct_locally / routed_locally if routed_locally else 0.0,
+        "misrouted": routed_locally - correct_locally,
+        "avg_local_routing_ms": local_time_ms / total if total else 0.0,
+        "latency_saved_ms": latency_saved_ms,
+        "avg_latency_saved_ms": latency_saved_ms / total if total else 0.0,
+        "per_agent": dict(per_agent),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the local intent router and report on a replay set")
+    parser.add_argument("train", help="JSONL file of logged routes used for training")
+    parser.add_argument("replay", help="JSONL file of logged routes used for evaluation")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--save", help="Write the trained model to this path")
+    args = parser.parse_args()
+
+    intent_router = IntentRouter(threshold=args.threshold)
+    intent_router.train(load_logged_routes(args.train))
+    if args.save:
+        intent_router.save(args.save)
+    print(json.dumps(evaluate_router(intent_router, load_logged_routes(args.replay)), indent=2))
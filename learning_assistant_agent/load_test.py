@@ -0,0 +1,463 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import LlmAgent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+# Conversations a synthetic student works through, one user message per turn.
+# Each entry names the agent that should handle it, the tool it triggers and
+# the tool arguments the stand-in model emits. Entries with "calls" emit all
+# of their tool calls in one response, and the tools run in parallel.
+SCENARIOS = [
+    {
+        "kind": "goal",
+        "message": "I want to set a goal to learn machine learning by the end of the term",
+        "agent": "goal_setting",
+        "tool": "add_learning_goal",
+        "args": {
+            "title": "Learn machine learning fundamentals",
+            "type": "knowledge",
+            "target_date": "2025-12-31",
+            "related_subjects": ["machine learning", "python"],
+        },
+    },
+    {
+        "kind": "curation",
+        "message": "Can you recommend resources for data science and save the best one",
+        "agent": "content_curator",
+        "tool": "add_resource_to_saved",
+        "args": {"resource_id": "kaggle_comp", "resource_name": "Kaggle Competitions", "resource_type": "external"},
+    },
+    {
+        "kind": "feedback",
+        "message": "I want to leave feedback, the Python course was helpful",
+        "agent": "feedback",
+        "tool": "submit_feedback",
+        "args": {"type": "course", "content": "Clear exercises", "rating": 5, "item_id": "python_intro"},
+    },
+    {
+        "kind": "adaptation",
+        "message": "Machine Learning Basics is too hard for me right now",
+        "agent": "adaptive_learning",
+        "tool": "adjust_content_difficulty",
+        "args": {"course_id": "ml_basics", "difficulty": "easier"},
+    },
+    {
+        "kind": "adaptation",
+        "message": "The web development course pace is too fast, please slow down",
+        "agent": "adaptive_learning",
+        "tool": "adjust_learning_pace",
+        "args": {"course_id": "web_dev_js", "pace": "slower"},
+    },
+    {
+        "kind": "adaptation",
+        "message": "Machine Learning Basics is too hard and too fast, make it easier and slow it down",
+        "agent": "adaptive_learning",
+        "calls": [
+            {"tool": "adjust_content_difficulty", "args": {"course_id": "ml_basics", "difficulty": "easier"}},
+            {"tool": "adjust_learning_pace", "args": {"course_id": "ml_basics", "pace": "slower"}},
+        ],
+    },
+]
+
+SCENARIO_BY_MESSAGE = {scenario["message"]: scenario for scenario in SCENARIOS}
+
+# Initial state for synthetic students; every key referenced by agent instructions is present
+INITIAL_STUDENT_STATE = {
+    "subject_interests": ["data science", "machine learning"],
+    "learning_style": "visual",
+    "career_aspirations": "Data scientist",
+    "learning_goals": [],
+    "completed_courses": ["python_intro"],
+    "current_courses": ["data_science_101"],
+    "quiz_results": [],
+    "saved_resources": [],
+    "feedback_list": [],
+    "recommendation_feedback": {},
+    "difficulty_preferences": {},
+    "pace_preferences": {},
+    "learning_time_data": {},
+    "engagement_metrics": {},
+    "interaction_history": [],
+}
+
+
+class LatencyDistribution:
+    """
+    Log-normal model call latency; sigma=0 gives a fixed latency.
+    """
+
+    def __init__(self, median_ms: float = 400.0, sigma: float = 0.5, seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.random = random.Random(seed)
+
+    def sample_seconds(self) -> float:
+        if self.sigma <= 0:
+            return self.median_ms / 1000
+        return self.random.lognormvariate(0, self.sigma) * self.median_ms / 1000
+
+
+def _scripted_response(*parts: types.Part) -> LlmResponse:
+    return LlmResponse(
+        content=types.Content(role="model", parts=list(parts)),
+        # Zero usage keeps ADK from logging missing token metadata on every call
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=0, candidates_token_count=0, total_token_count=0
+        ),
+    )
+
+
+def _function_call_part(name: str, args: dict) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def _text_response(text: str) -> LlmResponse:
+    return _scripted_response(types.Part(text=text))
+
+
+def _latest_scenario(llm_request: LlmRequest) -> Optional[dict]:
+    """
+    Finds the scenario of the most recent student message in the request.
+    """
+    for content in reversed(llm_request.contents or []):
+        for part in content.parts or []:
+            if part.text and part.text in SCENARIO_BY_MESSAGE:
+                return SCENARIO_BY_MESSAGE[part.text]
+    return None
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Offline stand-in model for one agent that follows SCENARIOS.
+
+    It transfers to the scenario's agent, emits the scenario's tool calls,
+    then answers with a short text once the tool response comes back.
+    """
+
+    agent_name: str = ""
+    latency: LatencyDistribution = None
+    calls: int = 0
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample_seconds())
+
+        last_parts = llm_request.contents[-1].parts or [] if llm_request.contents else []
+        function_responses = [part.function_response for part in last_parts if part.function_response]
+        if function_responses:
+            names = ", ".join(response.name for response in function_responses)
+            yield _text_response(f"Done: {names}")
+            return
+
+        scenario = _latest_scenario(llm_request)
+        if scenario is None:
+            yield _text_response("How can I help with your learning today?")
+        elif scenario["agent"] != self.agent_name:
+            yield _scripted_response(_function_call_part("transfer_to_agent", {"agent_name": scenario["agent"]}))
+        else:
+            calls = scenario.get("calls") or [scenario]
+            yield _scripted_response(*(_function_call_part(call["tool"], dict(call["args"])) for call in calls))
+
+
+def _part_signature(part: types.Part) -> str:
+    if part.function_call:
+        return f"call:{part.function_call.name}"
+    if part.function_response:
+        return f"response:{part.function_response.name}"
+    # Transcripts of other agents' turns embed call IDs and results
+    if part.text and part.text.startswith("For context:"):
+        return "context"
+    return part.text or ""
+
+
+def _request_key(llm_request: LlmRequest) -> str:
+    """
+    Fingerprints a request for record-replay by its tools, the latest student
+    message and the shape of the latest content. Call IDs and tool results
+    vary between runs, so only their names are used.
+    """
+    contents = llm_request.contents or []
+    student_message = ""
+    for content in reversed(contents):
+        signatures = [_part_signature(part) for part in content.parts or []]
+        if content.role == "user" and signatures and all(
+            signature and not signature.startswith(("call:", "response:", "context")) for signature in signatures
+        ):
+            student_message = " ".join(signatures)
+            break
+    payload = {
+        "tools": sorted(llm_request.tools_dict),
+        "student_message": student_message,
+        "last": [_part_signature(part) for part in contents[-1].parts or []] if contents else [],
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RecordReplayLlm(BaseLlm):
+    """
+    Records responses of a real model to a JSONL file, or replays them offline.
+
+    With inner set, requests go to the inner model and are recorded. Without
+    it, responses are served from the recording, keyed by request fingerprint.
+    """
+
+    recording_path: str = ""
+    inner: Optional[BaseLlm] = None
+    latency: LatencyDistribution = None
+    recordings: dict = {}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def model_post_init(self, __context) -> None:
+        self.recordings = {}
+        if self.inner is None:
+            with open(self.recording_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record["key"]] = record["responses"]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = _request_key(llm_request)
+        if self.inner is not None:
+            # Record before yielding, the caller may stop iterating after the final response
+            responses = [response async for response in self.inner.generate_content_async(llm_request, stream)]
+            with open(self.recording_path, "a", encoding="utf-8") as f:
+                record = [response.model_dump(mode="json", exclude_none=True) for response in responses]
+                f.write(json.dumps({"key": key, "responses": record}) + "\n")
+            for response in responses:
+                yield response
+            return
+
+        if key not in self.recordings:
+            raise ValueError(f"No recorded response for request {key}")
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample_seconds())
+        for response in self.recordings[key]:
+            yield LlmResponse.model_validate(response)
+
+
+def _expose_tool_args(tool, args, tool_context):
+    """
+    Makes the model's call arguments available as tool_context.args for the tools.
+    """
+    tool_context.args = dict(args)
+    return None
+
+
+def install_stand_in_model(agent: LlmAgent, model_factory) -> tuple:
+    """
+    Swaps every agent in the tree to a model built by model_factory(agent_name).
+    Returns the installed models and a function that puts the original models
+    and tool callbacks back.
+    """
+    models = []
+    originals = []
+
+    def install(current: LlmAgent) -> None:
+        originals.append((current, current.model, current.before_tool_callback))
+        current.model = model_factory(current.name)
+        models.append(current.model)
+
+        if current.tools:
+            callbacks = current.before_tool_callback or []
+            if not isinstance(callbacks, list):
+                callbacks = [callbacks]
+            if _expose_tool_args not in callbacks:
+                current.before_tool_callback = [_expose_tool_args] + callbacks
+
+        for sub_agent in current.sub_agents:
+            install(sub_agent)
+
+    def restore() -> None:
+        for current, model, callbacks in originals:
+            current.model = model
+            current.before_tool_callback = callbacks
+
+    install(agent)
+    return models, restore
+
+
+def _percentile(sorted_values: list, percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _run_student(runner: Runner, student_number: int, turns: int, metrics: dict) -> None:
+    """
+    Drives one synthetic student through its conversation turns.
+    """
+    user_id = f"student_{student_number}"
+    state = json.loads(json.dumps(INITIAL_STUDENT_STATE))
+    state["student_name"] = f"Student {student_number}"
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id, state=state)
+
+    for turn in range(turns):
+        scenario = SCENARIOS[(student_number + turn) % len(SCENARIOS)]
+        message = types.Content(role="user", parts=[types.Part(text=scenario["message"])])
+        start = time.perf_counter()
+        try:
+            async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+                for response in event.get_function_responses():
+                    if response.name == "transfer_to_agent":
+                        continue
+                    metrics["tool_calls"][response.name] += 1
+                    result = response.response or {}
+                    if result.get("status") == "error" or "error" in result:
+                        metrics["tool_errors"][response.name] += 1
+        except Exception as e:
+            metrics["failed_turns"] += 1
+            metrics["failures"][type(e).__name__] += 1
+            continue
+        metrics["turn_latencies"].append(time.perf_counter() - start)
+        metrics["turns_by_kind"][scenario["kind"]] += 1
+
+    final_session = await runner.session_service.get_session(
+        app_name=runner.app_name, user_id=user_id, session_id=session.id
+    )
+    metrics["state_bytes"].append(len(json.dumps(final_session.state, default=str)))
+    metrics["event_counts"].append(len(final_session.events))
+
+
+async def run_load_test(
+    agent: LlmAgent,
+    students: int = 1000,
+    turns_per_student: int = 4,
+    concurrency: int = 200,
+    latency: Optional[LatencyDistribution] = None,
+    model_factory=None,
+    session_service=None,
+) -> dict:
+    """
+    Runs synthetic students concurrently against the agent tree with a stand-in model.
+
+    By default every agent gets a ScriptedLlm with the given latency
+    distribution and sessions are kept in memory. The original models are
+    restored when the run ends. Reports turn latency
+    percentiles, throughput, tool error rates and session state growth.
+    """
+    if latency is None:
+        latency = LatencyDistribution()
+    if model_factory is None:
+        model_factory = lambda agent_name: ScriptedLlm(model="scripted", agent_name=agent_name, latency=latency)
+    models, restore_models = install_stand_in_model(agent, model_factory)
+
+    runner = Runner(
+        agent=agent,
+        app_name="learning_assistant_load_test",
+        session_service=session_service or InMemorySessionService(),
+    )
+    metrics = {
+        "turn_latencies": [],
+        "turns_by_kind": Counter(),
+        "tool_calls": Counter(),
+        "tool_errors": Counter(),
+        "failed_turns": 0,
+        "failures": Counter(),
+        "state_bytes": [],
+        "event_counts": [],
+    }
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(student_number: int) -> None:
+        async with semaphore:
+            await _run_student(runner, student_number, turns_per_student, metrics)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(limited(number) for number in range(students)))
+    finally:
+        # The agent tree is shared, later users must see the real models again
+        restore_models()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = sorted(latency_s * 1000 for latency_s in metrics["turn_latencies"])
+    state_bytes = sorted(metrics["state_bytes"])
+    total_tool_calls = sum(metrics["tool_calls"].values())
+    total_tool_errors = sum(metrics["tool_errors"].values())
+    completed_turns = len(latencies_ms)
+
+    return {
+        "students": students,
+        "turns": completed_turns,
+        "failed_turns": metrics["failed_turns"],
+        "failures": dict(metrics["failures"]),
+        "elapsed_s": elapsed,
+        "throughput_turns_per_s": completed_turns / elapsed if elapsed else 0.0,
+        "turn_latency_ms": {
+            "p50": _percentile(latencies_ms, 50),
+            "p95": _percentile(latencies_ms, 95),
+            "p99": _percentile(latencies_ms, 99),
+            "max": latencies_ms[-1] if latencies_ms else 0.0,
+        },
+        "model_calls": sum(getattr(model, "calls", 0) for model in models),
+        "turns_by_kind": dict(metrics["turns_by_kind"]),
+        "tool_calls": dict(metrics["tool_calls"]),
+        "tool_error_rate": total_tool_errors / total_tool_calls if total_tool_calls else 0.0,
+        "tool_errors": dict(metrics["tool_errors"]),
+        "state_bytes": {
+            "mean": sum(state_bytes) / len(state_bytes) if state_bytes else 0.0,
+            "p95": _percentile(state_bytes, 95),
+            "max": state_bytes[-1] if state_bytes else 0,
+            "per_turn": sum(state_bytes) / completed_turns if completed_turns else 0.0,
+        },
+        "events_per_session": sum(metrics["event_counts"]) / students if students else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+
+    from .agent import root_agent
+    from .state_events import EventStoreSessionService, StateEventStore
+
+    parser = argparse.ArgumentParser(description="Offline load test with a scripted stand-in model")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--median-latency-ms", type=float, default=400.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--replay", help="Serve model responses from this recording instead of the script")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    model_latency = LatencyDistribution(args.median_latency_ms, args.latency_sigma, seed=args.seed)
+    factory = None
+    if args.replay:
+        factory = lambda agent_name: RecordReplayLlm(
+            model="replay", recording_path=args.replay, latency=model_latency
+        )
+    # Persist state as operation events, outside the working directory unless configured
+    event_dir = os.environ.get("STATE_EVENT_DIR") or tempfile.mkdtemp(prefix="load_test_state_events_")
+    sessions = EventStoreSessionService(InMemorySessionService(), StateEventStore(event_dir))
+    report = asyncio.run(run_load_test(
+        root_agent,
+        students=args.students,
+        turns_per_student=args.turns,
+        concurrency=args.concurrency,
+        latency=model_latency,
+        model_factory=factory,
+        session_service=sessions,
+    ))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,466 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+
+# Keys that tools update with whole-collection read-copy-modify-write
+MERGEABLE_KEYS = {
+    "interaction_history",
+    "learning_goals",
+    "feedback_list",
+    "saved_resources",
+    "difficulty_preferences",
+    "pace_preferences",
+    "recommendation_feedback",
+    "goal_subject_index",
+}
+
+# Session state key holding the store version of each mergeable key, so a
+# reseeded store can tell which of two copies of a session is newer
+STATE_VERSIONS_KEY = "state_versions"
+
+# Past versions per key kept as merge bases for in-flight writers, capped both
+# by count and by the total number of collection items they hold
+HISTORY_LIMIT = 16
+HISTORY_MAX_ITEMS = 4096
+
+# Lengths of past list versions, enough to merge appends once a full base is gone
+LENGTH_HISTORY_LIMIT = 1024
+
+# Sessions untouched for this long are evicted; the store reseeds from session state
+IDLE_SESSION_TTL = 3600.0
+
+# Read versions of tool calls that never finished are dropped after this long
+IN_FLIGHT_TTL = 600.0
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a compare-and-swap finds a newer version that cannot be merged.
+    """
+
+    def __init__(self, session_key, key: str, expected_version: int, current_version: int):
+        super().__init__(
+            f"State key {key} for session {session_key} is at version {current_version}, "
+            f"expected {expected_version}"
+        )
+        self.session_key = session_key
+        self.key = key
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def store_key(session) -> tuple:
+    """
+    Returns the store key of an ADK session. Session IDs are only unique per app and user.
+    """
+    return session.app_name, session.user_id, session.id
+
+
+class SessionLockManager:
+    """
+    Hands out one re-entrant lock per session, dropped again once unused.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        # Threads holding or waiting for each lock
+        self._users = Counter()
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def lock(self, key):
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            session_lock = self._locks[key]
+            self._users[key] += 1
+        try:
+            with session_lock:
+                yield
+        finally:
+            with self._guard:
+                self._users[key] -= 1
+                if not self._users[key]:
+                    del self._users[key]
+
+    def discard(self, key, on_discard=None) -> bool:
+        """
+        Drops a session's lock if no thread holds or waits for it, calling
+        on_discard() while new users are still kept out. Returns whether it did.
+        """
+        with self._guard:
+            if self._users.get(key):
+                return False
+            self._locks.pop(key, None)
+            if on_discard is not None:
+                on_discard()
+            return True
+
+
+def _merge_list(base: list, new: list, current: list):
+    """
+    Three-way merges a list: the caller's in-place item edits and appended
+    items are replayed onto the current value. Returns None on conflict.
+    """
+    if len(new) < len(base) or len(current) < len(base):
+        return None
+    merged = list(current)
+    for index, (base_item, new_item) in enumerate(zip(base, new)):
+        if new_item == base_item:
+            continue
+        # Both sides edited the same item
+        if current[index] != base_item:
+            return None
+        merged[index] = new_item
+    merged.extend(new[len(base):])
+    return merged
+
+
+def _merge_dict(base: dict, new: dict, current: dict):
+    """
+    Three-way merges a dict field by field. Fields changed on both sides are
+    merged in turn when they hold collections. Returns None on conflict.
+    """
+    merged = dict(current)
+    for field in set(base) | set(new):
+        if base.get(field) == new.get(field) and (field in base) == (field in new):
+            continue
+        if current.get(field) != base.get(field) and current.get(field) != new.get(field):
+            # e.g. two goals indexed under the same new subject
+            new_value, current_value = new.get(field), current.get(field)
+            if not isinstance(new_value, (list, dict)) or type(new_value) is not type(current_value):
+                return None
+            merged_value = merge_values(base.get(field, type(new_value)()), new_value, current_value)
+            if merged_value is None:
+                return None
+            merged[field] = merged_value
+            continue
+        if field in new:
+            merged[field] = new[field]
+        else:
+            merged.pop(field, None)
+    return merged
+
+
+def _size(value) -> int:
+    return len(value) if isinstance(value, (list, dict)) else 1
+
+
+def merge_values(base, new, current):
+    """
+    Merges concurrent changes to a collection. Returns None when not mergeable.
+    """
+    if isinstance(base, list) and isinstance(new, list) and isinstance(current, list):
+        return _merge_list(base, new, current)
+    if isinstance(base, dict) and isinstance(new, dict) and isinstance(current, dict):
+        return _merge_dict(base, new, current)
+    return None
+
+
+class VersionedStateStore:
+    """
+    Per-session, per-key versioned state with compare-and-swap updates.
+
+    Every write bumps the key's version. A write based on an older version
+    is merged when the key is a mergeable collection and the changes do not
+    overlap; otherwise it raises VersionConflict.
+    """
+
+    def __init__(self, lock_manager: SessionLockManager = None, idle_ttl: float = IDLE_SESSION_TTL):
+        self.lock_manager = lock_manager or SessionLockManager()
+        self.idle_ttl = idle_ttl
+        self._values = defaultdict(dict)
+        self._versions = defaultdict(dict)
+        # Recent values of each key, oldest first, used as the base of three-way merges
+        self._history = defaultdict(lambda: defaultdict(OrderedDict))
+        # Lengths of recent list values, used to merge appends without a full base
+        self._lengths = defaultdict(lambda: defaultdict(OrderedDict))
+        self._last_access = {}
+        self._last_sweep = time.monotonic()
+
+    def _touch(self, session_key) -> None:
+        self._last_access[session_key] = time.monotonic()
+
+    def get(self, session_key, key: str, default=None) -> tuple:
+        """
+        Returns (value, version). Missing keys have version 0.
+        """
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            if key not in self._values[session_key]:
+                return copy.deepcopy(default), 0
+            return copy.deepcopy(self._values[session_key][key]), self._versions[session_key][key]
+
+    def versions(self, session_key) -> dict:
+        """
+        Returns {key: version} for a session without copying any values.
+        """
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            return dict(self._versions[session_key])
+
+    def seed(self, session_key, state) -> None:
+        """
+        Loads keys from a session state that the store has not seen yet, or
+        that the session holds at a newer version than the store.
+        """
+        self.evict_idle()
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            session_versions = state.get(STATE_VERSIONS_KEY, {})
+            for key in MERGEABLE_KEYS:
+                if key not in state:
+                    continue
+                session_version = session_versions.get(key, 0)
+                if key not in self._values[session_key]:
+                    self._write(session_key, key, copy.deepcopy(state[key]), version=max(session_version, 1))
+                elif session_version > self._versions[session_key][key]:
+                    # The store was reseeded from a stale copy of this session; keep the newer value
+                    self._write(session_key, key, copy.deepcopy(state[key]), version=session_version)
+
+    def evict_idle(self, force: bool = False) -> int:
+        """
+        Drops sessions idle for longer than idle_ttl, with their locks. Runs
+        at most every tenth of the TTL unless forced. Returns the number evicted.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sweep < self.idle_ttl / 10:
+            return 0
+        self._last_sweep = now
+
+        def drop(session_key):
+            self._values.pop(session_key, None)
+            self._versions.pop(session_key, None)
+            self._history.pop(session_key, None)
+            self._lengths.pop(session_key, None)
+            self._last_access.pop(session_key, None)
+
+        evicted = 0
+        for session_key, last_access in list(self._last_access.items()):
+            # Sessions someone is working on right now are skipped
+            if now - last_access >= self.idle_ttl and self.lock_manager.discard(
+                session_key, lambda: drop(session_key)
+            ):
+                evicted += 1
+        return evicted
+
+    def _write(self, session_key, key: str, value, version: int = None) -> int:
+        if version is None:
+            version = self._versions[session_key].get(key, 0) + 1
+        self._values[session_key][key] = value
+        self._versions[session_key][key] = version
+
+        history = self._history[session_key][key]
+        history[version] = value
+        history_items = sum(_size(past_value) for past_value in history.values())
+        while len(history) > 1 and (len(history) > HISTORY_LIMIT or history_items > HISTORY_MAX_ITEMS):
+            _, dropped = history.popitem(last=False)
+            history_items -= _size(dropped)
+
+        if isinstance(value, list):
+            lengths = self._lengths[session_key][key]
+            lengths[version] = len(value)
+            while len(lengths) > LENGTH_HISTORY_LIMIT:
+                lengths.popitem(last=False)
+        return version
+
+    def compare_and_swap(self, session_key, key: str, expected_version: int, new_value) -> int:
+        """
+        Writes new_value if the key is still at expected_version.
+        Returns the new version or raises VersionConflict.
+        """
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            current_version = self._versions[session_key].get(key, 0)
+            if current_version != expected_version:
+                raise VersionConflict(session_key, key, expected_version, current_version)
+            return self._write(session_key, key, copy.deepcopy(new_value))
+
+    def _resolve(self, session_key, key: str, read_version: int, new_value) -> tuple:
+        """
+        Works out what committing new_value would write, without writing.
+        Returns (value, needs_write) or raises VersionConflict.
+        """
+        current_version = self._versions[session_key].get(key, 0)
+        current = self._values[session_key].get(key)
+        if current_version == read_version:
+            # Unchanged values (e.g. keys only synced into the tool's view) keep their version
+            if current_version and current == new_value:
+                return current, False
+            return new_value, True
+
+        base = self._history[session_key][key].get(read_version)
+        merged = None
+        if key in MERGEABLE_KEYS and (read_version == 0 or base is not None):
+            if base is None:
+                base = [] if isinstance(new_value, list) else {}
+            merged = merge_values(base, new_value, current)
+        elif key in MERGEABLE_KEYS and isinstance(new_value, list) and isinstance(current, list):
+            # Appends only need the length the writer read, as long as the
+            # prefix both sides share is untouched
+            read_length = self._lengths[session_key][key].get(read_version)
+            if (read_length is not None and len(new_value) >= read_length
+                    and new_value[:read_length] == current[:read_length]):
+                merged = current + new_value[read_length:]
+        if merged is None:
+            raise VersionConflict(session_key, key, read_version, current_version)
+        return merged, True
+
+    def commit(self, session_key, key: str, read_version: int, new_value) -> tuple:
+        """
+        Writes a value computed from read_version, merging if the key moved on.
+        Returns (merged_value, new_version) or raises VersionConflict.
+        """
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            value, needs_write = self._resolve(session_key, key, read_version, new_value)
+            if not needs_write:
+                return copy.deepcopy(value), self._versions[session_key][key]
+            return copy.deepcopy(value), self._write(session_key, key, copy.deepcopy(value))
+
+    def commit_many(self, session_key, read_versions: dict, new_values: dict) -> dict:
+        """
+        Commits several keys atomically: every key is merged first and nothing
+        is written unless all of them succeed. Returns {key: merged_value}.
+        """
+        with self.lock_manager.lock(session_key):
+            self._touch(session_key)
+            resolved = {
+                key: self._resolve(session_key, key, read_versions.get(key, 0), new_values[key])
+                for key in sorted(new_values)
+            }
+            for key, (value, needs_write) in resolved.items():
+                if needs_write:
+                    self._write(session_key, key, copy.deepcopy(value))
+            return {key: copy.deepcopy(value) for key, (value, _) in resolved.items()}
+
+    def update(self, session_key, key: str, update_fn, default=None, retries: int = 5):
+        """
+        Applies update_fn(value) -> new_value with optimistic retries.
+        """
+        for _ in range(retries):
+            value, version = self.get(session_key, key, default)
+            try:
+                self.compare_and_swap(session_key, key, version, update_fn(value))
+                return self.get(session_key, key)[0]
+            except VersionConflict:
+                continue
+        raise VersionConflict(session_key, key, version, self.get(session_key, key)[1])
+
+    def append(self, session_key, key: str, *items) -> list:
+        """
+        Appends items to a list key; concurrent appends never conflict.
+        """
+        for _ in range(HISTORY_LIMIT):
+            value, version = self.get(session_key, key, default=[])
+            try:
+                # A stale read is merged by commit, so this only retries if the
+                # merge base fell out of the version history
+                return self.commit(session_key, key, version, value + list(items))[0]
+            except VersionConflict:
+                continue
+        raise VersionConflict(session_key, key, version, self.get(session_key, key)[1])
+
+
+def sync_state(store: VersionedStateStore, session_key, state) -> None:
+    """
+    Brings a session state up to date with the store's merged values.
+
+    Keys the session holds at a newer version than the store (e.g. after the
+    store was evicted and reseeded from a stale copy) are taken from the
+    session instead. Versions are recorded in the session's state_versions.
+    """
+    with store.lock_manager.lock(session_key):
+        store.seed(session_key, state)
+        session_versions = state.get(STATE_VERSIONS_KEY, {})
+        updated_versions = {}
+        for key, version in store.versions(session_key).items():
+            if session_versions.get(key, 0) != version:
+                state[key] = store.get(session_key, key)[0]
+                updated_versions[key] = version
+        if updated_versions:
+            state[STATE_VERSIONS_KEY] = {**session_versions, **updated_versions}
+
+
+def make_concurrency_callbacks(store: VersionedStateStore) -> tuple:
+    """
+    Creates (before_tool_callback, after_tool_callback) that make tool state
+    writes safe under parallel tool calls on the same session.
+
+    Before a tool runs, its session state is synced with the store and the
+    versions it reads are recorded. After it runs, all written keys are
+    committed atomically, merging concurrent collection updates. If any key
+    cannot be merged, none are written and the tool reports an error.
+
+    Also returns an on_tool_error_callback that forgets the read versions of
+    calls that raised, as (before, after, on_error).
+    """
+    # (recorded_at, read versions) of in-flight tool calls, keyed by (session, function call ID)
+    in_flight = {}
+
+    def guard_tool_state(tool, args, tool_context):
+        key = store_key(tool_context.session)
+        now = time.monotonic()
+        for call_key, (recorded_at, _) in list(in_flight.items()):
+            if now - recorded_at > IN_FLIGHT_TTL:
+                in_flight.pop(call_key, None)
+
+        with store.lock_manager.lock(key):
+            sync_state(store, key, tool_context.state)
+            read_versions = store.versions(key)
+        in_flight[(key, tool_context.function_call_id)] = (now, read_versions)
+        return None
+
+    def commit_tool_state(tool, args, tool_context, tool_response):
+        key = store_key(tool_context.session)
+        _, read_versions = in_flight.pop((key, tool_context.function_call_id), (None, {}))
+
+        state_delta = tool_context.actions.state_delta
+        written = {name: state_delta[name] for name in MERGEABLE_KEYS if name in state_delta}
+        if not written:
+            return None
+        try:
+            with store.lock_manager.lock(key):
+                merged = store.commit_many(key, read_versions, written)
+                versions = store.versions(key)
+        except VersionConflict as e:
+            # Nothing was committed; drop the writes so the tool can be retried cleanly
+            for written_key in written:
+                state_delta.pop(written_key, None)
+            return {
+                "status": "error",
+                "message": f"{e.key} was changed concurrently, please retry",
+            }
+        state_delta.update(merged)
+        state_delta[STATE_VERSIONS_KEY] = {
+            **tool_context.state.get(STATE_VERSIONS_KEY, {}),
+            **{name: versions[name] for name in merged},
+        }
+        return None
+
+    def release_tool_state(tool, args, tool_context, error):
+        in_flight.pop((store_key(tool_context.session), tool_context.function_call_id), None)
+        return None
+
+    return guard_tool_state, commit_tool_state, release_tool_state
+
+
+def make_state_sync_callback(store: VersionedStateStore):
+    """
+    Creates a before_model_callback that syncs merged store values into the session.
+    """
+
+    def sync_before_model(callback_context, llm_request):
+        sync_state(store, store_key(callback_context.session), callback_context.state)
+        return None
+
+    return sync_before_model
+
+
+# Shared store and lock manager for all agents serving sessions in this process
+session_locks = SessionLockManager()
+session_state_store = VersionedStateStore(session_locks)
+guard_tool_state, commit_tool_state, release_tool_state = make_concurrency_callbacks(session_state_store)
+sync_student_state = make_state_sync_callback(session_state_store)
@@ -0,0 +1,430 @@
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+# Number of recorded events after which a session log is compacted into a snapshot
+DEFAULT_SNAPSHOT_EVERY = 50
+
+# Sessions whose materialized state is kept in memory; others are resumed from disk
+DEFAULT_MAX_CACHED_SESSIONS = 1000
+
+
+def _diff_item(index: int, old_item, new_item) -> dict:
+    """
+    Returns the smallest operation turning one list item into another.
+    Dict items only carry the fields that changed (e.g. a goal's progress).
+    """
+    if isinstance(old_item, dict) and isinstance(new_item, dict):
+        fields = {name: value for name, value in new_item.items() if old_item.get(name) != value}
+        removed = [name for name in old_item if name not in new_item]
+        if not removed:
+            return {"op": "update_item", "index": index, "fields": fields}
+    return {"op": "set_item", "index": index, "value": new_item}
+
+
+def diff_state(old_state: dict, new_state: dict) -> list:
+    """
+    Converts a state change into small operations.
+
+    Lists that only grew become "append" ops, lists whose items changed in
+    place become per-item ops, and dicts become per-field ops. Anything else
+    falls back to replacing the value with "set".
+    """
+    ops = []
+    for key, new_value in new_state.items():
+        old_value = old_state.get(key)
+        if old_value == new_value and key in old_state:
+            continue
+
+        if isinstance(old_value, list) and isinstance(new_value, list) and len(new_value) >= len(old_value):
+            item_ops = [
+                _diff_item(index, old_item, new_item)
+                for index, (old_item, new_item) in enumerate(zip(old_value, new_value))
+                if old_item != new_item
+            ]
+            appended = new_value[len(old_value):]
+            for item_op in item_ops:
+                item_op["key"] = key
+                ops.append(item_op)
+            if appended:
+                ops.append({"op": "append", "key": key, "items": appended})
+        elif isinstance(old_value, dict) and isinstance(new_value, dict):
+            for field, field_value in new_value.items():
+                if field not in old_value or old_value[field] != field_value:
+                    ops.append({"op": "set_field", "key": key, "field": field, "value": field_value})
+            for field in old_value:
+                if field not in new_value:
+                    ops.append({"op": "delete_field", "key": key, "field": field})
+        else:
+            ops.append({"op": "set", "key": key, "value": new_value})
+    return ops
+
+
+def apply_ops(state: dict, ops: list) -> dict:
+    """
+    Applies operations to a state dict in place and returns it.
+    """
+    for op in ops:
+        key = op["key"]
+        kind = op["op"]
+        if kind == "set":
+            state[key] = op["value"]
+        elif kind == "delete":
+            state.pop(key, None)
+        elif kind == "append":
+            state.setdefault(key, []).extend(op["items"])
+        elif kind == "set_item":
+            state[key][op["index"]] = op["value"]
+        elif kind == "update_item":
+            state[key][op["index"]].update(op["fields"])
+        elif kind == "set_field":
+            state.setdefault(key, {})[op["field"]] = op["value"]
+        elif kind == "delete_field":
+            state.get(key, {}).pop(op["field"], None)
+        else:
+            raise ValueError(f"Unknown state operation: {kind}")
+    return state
+
+
+def event_store_key(app_name: str, user_id: str, session_id: str) -> str:
+    """
+    Returns the store key of a session. Session IDs are only unique per app and user.
+    """
+    return json.dumps([app_name, user_id, session_id])
+
+
+class StateEventStore:
+    """
+    Append-only store of per-session state operations with compacted snapshots.
+
+    Each session has a JSONL log of operation events and a snapshot file. Every
+    snapshot_every events the current state is written as a snapshot and the
+    log is truncated, so resuming reads one snapshot plus a short tail.
+    Sessions are identified by a key string (see event_store_key); file names are
+    hashes of it, so client-chosen session IDs never reach the file system.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY,
+                 max_cached_sessions: int = DEFAULT_MAX_CACHED_SESSIONS):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.max_cached_sessions = max_cached_sessions
+        self.states = OrderedDict()
+        self.sequences = {}
+        self.tail_lengths = {}
+
+    def _file_stem(self, session_key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(session_key.encode("utf-8")).hexdigest())
+
+    def _log_path(self, session_key: str) -> str:
+        return self._file_stem(session_key) + ".log.jsonl"
+
+    def _snapshot_path(self, session_key: str) -> str:
+        return self._file_stem(session_key) + ".snapshot.json"
+
+    def _current_state(self, session_key: str) -> dict:
+        if session_key not in self.states:
+            self.resume(session_key)
+        self.states.move_to_end(session_key)
+        return self.states[session_key]
+
+    def get_state(self, session_key: str) -> dict:
+        """
+        Returns a copy of a session's current state.
+        """
+        return copy.deepcopy(self._current_state(session_key))
+
+    def delete(self, session_key: str) -> None:
+        """
+        Removes a session's snapshot, log and cached state.
+        """
+        for path in (self._snapshot_path(session_key), self._log_path(session_key)):
+            if os.path.exists(path):
+                os.remove(path)
+        self.states.pop(session_key, None)
+        self.sequences.pop(session_key, None)
+        self.tail_lengths.pop(session_key, None)
+
+    def has_session(self, session_key: str) -> bool:
+        """
+        Returns whether anything has been recorded for a session.
+        """
+        if self.sequences.get(session_key):
+            return True
+        return os.path.exists(self._snapshot_path(session_key)) or os.path.exists(self._log_path(session_key))
+
+    def record(self, session_key: str, state_delta: dict) -> list:
+        """
+        Records a state delta (key -> new value, as tools assign it) as operations.
+        Returns the operations written to the log.
+        """
+        state = self._current_state(session_key)
+        ops = diff_state(state, state_delta)
+        if not ops:
+            return ops
+
+        sequence = self.sequences[session_key] + 1
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._log_path(session_key), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": sequence, "ops": ops}, default=str) + "\n")
+        # Apply a deep copy so later caller-side mutations never leak into the store
+        apply_ops(state, copy.deepcopy(ops))
+        self.sequences[session_key] = sequence
+        self.tail_lengths[session_key] += 1
+
+        if self.tail_lengths[session_key] >= self.snapshot_every:
+            self.compact(session_key)
+        return ops
+
+    def compact(self, session_key: str) -> None:
+        """
+        Writes the current state as a snapshot and truncates the session log.
+        """
+        state = self._current_state(session_key)
+        snapshot_path = self._snapshot_path(session_key)
+        with open(snapshot_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"seq": self.sequences[session_key], "state": state}, f, default=str)
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+        # Events at or below the snapshot sequence are skipped on resume, so a
+        # crash between the two steps only leaves a longer tail behind
+        open(self._log_path(session_key), "w", encoding="utf-8").close()
+        self.tail_lengths[session_key] = 0
+
+    def resume(self, session_key: str) -> dict:
+        """
+        Rebuilds a session's state from its latest snapshot plus the log tail.
+        """
+        state = {}
+        sequence = 0
+        snapshot_path = self._snapshot_path(session_key)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state = snapshot["state"]
+            sequence = snapshot["seq"]
+
+        tail_length = 0
+        log_path = self._log_path(session_key)
+        if os.path.exists(log_path):
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event["seq"] <= sequence:
+                        continue
+                    apply_ops(state, event["ops"])
+                    sequence = event["seq"]
+                    tail_length += 1
+
+        self.states[session_key] = state
+        self.sequences[session_key] = sequence
+        self.tail_lengths[session_key] = tail_length
+
+        # Evict the least recently used sessions; their state stays on disk
+        while len(self.states) > self.max_cached_sessions:
+            evicted_id, _ = self.states.popitem(last=False)
+            self.sequences.pop(evicted_id, None)
+            self.tail_lengths.pop(evicted_id, None)
+        return copy.deepcopy(state)
+
+    def size_bytes(self, session_key: str) -> int:
+        """
+        Returns the bytes on disk for a session's snapshot and log.
+        """
+        total = 0
+        for path in (self._snapshot_path(session_key), self._log_path(session_key)):
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+
+def _is_session_scoped(key: str) -> bool:
+    # App- and user-scoped keys are shared across sessions, temp keys are never persisted
+    return not key.startswith((State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX))
+
+
+class EventStoreSessionService(BaseSessionService):
+    """
+    Session service that persists session-scoped state as operation events.
+
+    Wraps another session service, which keeps sessions, events and app/user
+    state. Session-scoped state deltas are diffed into small operations in a
+    StateEventStore and stripped from the events passed on, so persisted
+    events no longer carry whole collections. get_session rebuilds the state
+    from the latest snapshot plus the log tail.
+
+    Use it as the runner's session service, e.g.
+    Runner(agent=root_agent, app_name=..., session_service=EventStoreSessionService(DatabaseSessionService(url))).
+    """
+
+    def __init__(self, inner: BaseSessionService, store: StateEventStore = None):
+        self.inner = inner
+        self.store = store or StateEventStore(os.environ.get("STATE_EVENT_DIR", ".state_events"))
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict] = None,
+                             session_id: Optional[str] = None) -> Session:
+        state = state or {}
+        session_state = {key: value for key, value in state.items() if _is_session_scoped(key)}
+        session = await self.inner.create_session(
+            app_name=app_name,
+            user_id=user_id,
+            state={key: value for key, value in state.items() if key not in session_state},
+            session_id=session_id,
+        )
+        key = event_store_key(app_name, user_id, session.id)
+        # A reused session ID must not inherit a deleted session's state
+        self.store.delete(key)
+        if session_state:
+            self.store.record(key, copy.deepcopy(session_state))
+        session.state.update(self.store.get_state(key))
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        session = await self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            session.state.update(self.store.get_state(event_store_key(app_name, user_id, session_id)))
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self.inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self.store.delete(event_store_key(app_name, user_id, session_id))
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> dict:
+        return await self.inner.get_user_state(app_name=app_name, user_id=user_id)
+
+    async def flush(self) -> None:
+        await self.inner.flush()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        state_delta = event.actions.state_delta if event.actions else {}
+        session_delta = {key: value for key, value in state_delta.items() if _is_session_scoped(key)}
+        if not session_delta:
+            await self.inner.append_event(session, event)
+            return event
+
+        self.store.record(event_store_key(session.app_name, session.user_id, session.id), copy.deepcopy(session_delta))
+        # The inner service stores the event without the session-scoped state
+        stripped_actions = event.actions.model_copy(update={
+            "state_delta": {key: value for key, value in state_delta.items() if key not in session_delta}
+        })
+        await self.inner.append_event(session, event.model_copy(update={"actions": stripped_actions}))
+        session.state.update(session_delta)
+        return event
+
+
+def _simulated_deltas(interactions: int) -> list:
+    """
+    Produces the state deltas a session's tools would emit, whole collections included.
+    """
+    state = {"learning_goals": [], "feedback_list": [], "interaction_history": []}
+    deltas = []
+    for step in range(interactions):
+        timestamp = f"2025-01-01 00:{step // 60 % 60:02d}:{step % 60:02d}"
+        if step % 3 == 0 or not state["learning_goals"]:
+            state["learning_goals"] = state["learning_goals"] + [{
+                "id": f"goal_{step}",
+                "title": f"Goal {step}",
+                "description": "Understand key machine learning algorithms and their applications",
+                "type": "knowledge",
+                "status": "active",
+                "progress": 0,
+                "created_date": timestamp,
+                "target_date": "",
+                "related_subjects": ["machine learning", "python"],
+            }]
+            action = {"action": "add_goal", "goal_id": f"goal_{step}", "timestamp": timestamp}
+            changed = {"learning_goals": state["learning_goals"]}
+        elif step % 3 == 1:
+            goals = [goal.copy() for goal in state["learning_goals"]]
+            goals[-1]["progress"] = min(100, goals[-1]["progress"] + 25)
+            state["learning_goals"] = goals
+            action = {"action": "update_goal_progress", "goal_id": goals[-1]["id"], "timestamp": timestamp}
+            changed = {"learning_goals": goals}
+        else:
+            state["feedback_list"] = state["feedback_list"] + [{
+                "id": f"feedback_{step}",
+                "type": "course",
+                "content": "The exercises were helpful but the pace was a bit fast",
+                "rating": 4,
+                "item_id": "ml_basics",
+                "timestamp": timestamp,
+            }]
+            action = {"action": "submit_feedback", "feedback_id": f"feedback_{step}", "timestamp": timestamp}
+            changed = {"feedback_list": state["feedback_list"]}
+
+        state["interaction_history"] = state["interaction_history"] + [action]
+        changed["interaction_history"] = state["interaction_history"]
+        deltas.append(json.loads(json.dumps(changed)))
+    return deltas
+
+
+def benchmark_resume(directory: str, interactions: int = 500, snapshot_every: int = DEFAULT_SNAPSHOT_EVERY) -> dict:
+    """
+    Compares full-collection state events against operation events with snapshots.
+    Reports event-store bytes and session resume time for both approaches.
+    """
+    deltas = _simulated_deltas(interactions)
+
+    # Current behavior: each event carries whole collections, resume replays them all
+    full_log_path = os.path.join(directory, "full_state_events.jsonl")
+    os.makedirs(directory, exist_ok=True)
+    with open(full_log_path, "w", encoding="utf-8") as f:
+        for delta in deltas:
+            f.write(json.dumps({"state_delta": delta}) + "\n")
+    start = time.perf_counter()
+    full_state = {}
+    with open(full_log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            full_state.update(json.loads(line)["state_delta"])
+    full_resume_ms = (time.perf_counter() - start) * 1000
+
+    # Operation events with periodic compaction
+    store = StateEventStore(os.path.join(directory, "ops"), snapshot_every=snapshot_every)
+    benchmark_key = "benchmark_session"
+    store.delete(benchmark_key)
+    for delta in deltas:
+        store.record(benchmark_key, delta)
+    start = time.perf_counter()
+    ops_state = StateEventStore(store.directory, snapshot_every=snapshot_every).resume(benchmark_key)
+    ops_resume_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "interactions": interactions,
+        "states_match": ops_state == full_state,
+        "full_state_bytes": os.path.getsize(full_log_path),
+        "ops_store_bytes": store.size_bytes(benchmark_key),
+        "full_state_resume_ms": full_resume_ms,
+        "ops_resume_ms": ops_resume_ms,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark session resume with operation events and snapshots")
+    parser.add_argument("--interactions", type=int, default=500)
+    parser.add_argument("--snapshot-every", type=int, default=DEFAULT_SNAPSHOT_EVERY)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        print(json.dumps(benchmark_resume(benchmark_dir, args.interactions, args.snapshot_every), indent=2))
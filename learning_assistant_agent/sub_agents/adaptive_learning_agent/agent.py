@@ -3,6 +3,13 @@ from datetime import datetime
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...state_concurrency import (
+    commit_tool_state,
+    guard_tool_state,
+    release_tool_state,
+    sync_student_state,
+)
+
 
 def adjust_content_difficulty(tool_context: ToolContext) -> dict:
     """
@@ -16,7 +23,8 @@ def adjust_content_difficulty(tool_context: ToolContext) -> dict:
     # Get current difficulty preferences
     difficulty_preferences = tool_context.state.get("difficulty_preferences", {})
 
-    # Update difficulty preference for the course
+    # Update difficulty preference for the course on a copy
+    difficulty_preferences = difficulty_preferences.copy()
     difficulty_preferences[course_id] = new_difficulty
 
     # Update state
@@ -54,7 +62,8 @@ def adjust_learning_pace(tool_context: ToolContext) -> dict:
     # Get current pace preferences
     pace_preferences = tool_context.state.get("pace_preferences", {})
 
-    # Update pace preference for the course
+    # Update pace preference for the course on a copy
+    pace_preferences = pace_preferences.copy()
     pace_preferences[course_id] = new_pace
 
     # Update state
@@ -151,4 +160,9 @@ adaptive_learning_agent = Agent(
     - Real-time adaptations in response to current session data
     """,
     tools=[adjust_content_difficulty, adjust_learning_pace],
+    # Tool state writes are versioned and merged so parallel tool calls are safe
+    before_model_callback=sync_student_state,
+    before_tool_callback=guard_tool_state,
+    after_tool_callback=commit_tool_state,
+    on_tool_error_callback=release_tool_state,
 )
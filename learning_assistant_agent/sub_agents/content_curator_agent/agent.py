@@ -3,6 +3,14 @@ from datetime import datetime
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...catalog import format_content_library
+from ...state_concurrency import (
+    commit_tool_state,
+    guard_tool_state,
+    release_tool_state,
+    sync_student_state,
+)
+
 
 def add_resource_to_saved(tool_context: ToolContext) -> dict:
     """
@@ -87,58 +95,7 @@ content_curator_agent = Agent(
     </learning_history>
 
     <content_library>
-    Available Courses:
-    1. Introduction to Python Programming (ID: python_intro)
-       - Beginner level
-       - Video lectures, coding exercises, quizzes
-       - 20 hours total length
-
-    2. Data Science Fundamentals (ID: data_science_101)
-       - Intermediate level
-       - Interactive notebooks, projects, assessments
-       - 30 hours total length
-
-    3. Machine Learning Basics (ID: ml_basics)
-       - Intermediate level
-       - Video tutorials, programming assignments, case studies
-       - 40 hours total length
-
-    4. Web Development with JavaScript (ID: web_dev_js)
-       - Beginner level
-       - Interactive tutorials, project-based learning
-       - 25 hours total length
-
-    5. Advanced Mathematics for CS (ID: adv_math_cs)
-       - Advanced level
-       - Problem sets, video lectures, practice tests
-       - 35 hours total length
-
-    External Resources:
-    1. CS50 Harvard Online Course (ID: cs50_harvard)
-       - Comprehensive introduction to computer science
-       - Video lectures, assignments, forums
-       - URL: https://cs50.harvard.edu/
-
-    2. Kaggle Competitions (ID: kaggle_comp)
-       - Real-world data science challenges
-       - Datasets, community solutions, forums
-       - URL: https://www.kaggle.com/competitions
-
-    3. MIT OpenCourseWare (ID: mit_ocw)
-       - Free lecture notes, exams, and videos
-       - Various CS and mathematics topics
-       - URL: https://ocw.mit.edu/
-
-    4. freeCodeCamp (ID: freecodecamp)
-       - Interactive coding challenges and projects
-       - Certification paths available
-       - URL: https://www.freecodecamp.org/
-
-    5. Khan Academy (ID: khan_academy)
-       - Video tutorials and practice exercises
-       - Strong focus on mathematics fundamentals
-       - URL: https://www.khanacademy.org/
-    </content_library>
+""" + format_content_library() + """    </content_library>
 
     Your responsibilities:
 
@@ -180,4 +137,9 @@ content_curator_agent = Agent(
     - Saved resource updates and organization recommendations
     """,
     tools=[add_resource_to_saved],
+    # Tool state writes are versioned and merged so parallel tool calls are safe
+    before_model_callback=sync_student_state,
+    before_tool_callback=guard_tool_state,
+    after_tool_callback=commit_tool_state,
+    on_tool_error_callback=release_tool_state,
 )
@@ -3,6 +3,13 @@ from datetime import datetime
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...state_concurrency import (
+    commit_tool_state,
+    guard_tool_state,
+    release_tool_state,
+    sync_student_state,
+)
+
 
 def submit_feedback(tool_context: ToolContext) -> dict:
     """
@@ -66,7 +73,8 @@ def update_recommendation_relevance(tool_context: ToolContext) -> dict:
     # Get current recommendation feedback
     recommendation_feedback = tool_context.state.get("recommendation_feedback", {})
     
-    # Update feedback for the specific recommendation
+    # Update feedback for the specific recommendation on a copy
+    recommendation_feedback = recommendation_feedback.copy()
     recommendation_feedback[recommendation_id] = {
         "relevance_score": relevance_score,
         "feedback_note": feedback_note,
@@ -166,4 +174,9 @@ feedback_agent = Agent(
     - Improvement suggestions for the overall learning experience
     """,
     tools=[submit_feedback, update_recommendation_relevance],
+    # Tool state writes are versioned and merged so parallel tool calls are safe
+    before_model_callback=sync_student_state,
+    before_tool_callback=guard_tool_state,
+    after_tool_callback=commit_tool_state,
+    on_tool_error_callback=release_tool_state,
 )
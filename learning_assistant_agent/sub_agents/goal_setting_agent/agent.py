@@ -3,6 +3,15 @@ from datetime import datetime
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...catalog import format_catalog_subjects
+from ...goal_progress import register_goal
+from ...state_concurrency import (
+    commit_tool_state,
+    guard_tool_state,
+    release_tool_state,
+    sync_student_state,
+)
+
 
 def add_learning_goal(tool_context: ToolContext) -> dict:
     """
@@ -23,7 +32,7 @@ def add_learning_goal(tool_context: ToolContext) -> dict:
 
     # Add the new goal
     new_goals = learning_goals.copy()
-    new_goals.append({
+    new_goal = {
         "id": goal_id,
         "title": goal_title,
         "description": goal_description,
@@ -33,7 +42,10 @@ def add_learning_goal(tool_context: ToolContext) -> dict:
         "created_date": current_time,
         "target_date": goal_target_date,
         "related_subjects": goal_related_subjects
-    })
+    }
+
+    # Index the goal by subject and derive its starting progress
+    new_goals.append(register_goal(tool_context.state, new_goal))
 
     # Update state
     tool_context.state["learning_goals"] = new_goals
@@ -158,6 +170,9 @@ goal_setting_agent = Agent(
     Quiz Results: {quiz_results}
     </learning_history>
 
+    <catalog_subjects>
+""" + format_catalog_subjects() + """    </catalog_subjects>
+
     Your responsibilities:
 
     1. Goal Creation
@@ -169,7 +184,9 @@ goal_setting_agent = Agent(
 
     2. Progress Tracking
        - Monitor goal progress through regular check-ins
-       - Use update_goal_progress tool to record progress updates
+       - Always set related_subjects when adding goals, preferring the course IDs and subjects in catalog_subjects
+       - Progress is derived automatically from quiz results and course completions only when at least one related subject is a catalog course ID, a catalog subject or a topic the student has quiz results for
+       - Goals with derived progress have progress_source "derived"; use update_goal_progress tool for all other goals, e.g. goals on topics outside the catalog
        - Help students identify and overcome obstacles
        - Suggest resources to aid in goal achievement
        - Maintain an appropriate timeline for each goal
@@ -208,4 +225,9 @@ goal_setting_agent = Agent(
     - Goal refinement recommendations when necessary
     """,
     tools=[add_learning_goal, update_goal_progress],
+    # Tool state writes are versioned and merged so parallel tool calls are safe
+    before_model_callback=sync_student_state,
+    before_tool_callback=guard_tool_state,
+    after_tool_callback=commit_tool_state,
+    on_tool_error_callback=release_tool_state,
 )
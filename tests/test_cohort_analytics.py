@@ -0,0 +1,74 @@
+from learning_assistant_agent.cohort_analytics import (
+    CohortSnapshot,
+    average_quiz_score_by_course,
+    goal_completion_rate,
+    top_rated_resources,
+    update_snapshot,
+)
+
+
+def _state(score, rating=4, status="active"):
+    return {
+        "quiz_results": [{"course_id": "ml_basics", "score": score}],
+        "learning_goals": [{"id": "g1", "type": "skill", "status": status, "progress": 50}],
+        "feedback_list": [{"item_id": "ml_basics", "type": "course", "rating": rating}],
+    }
+
+
+def test_aggregates(tmp_path):
+    update_snapshot(str(tmp_path), [("a", _state(60, status="completed")), ("b", _state(80, rating=0))])
+    snapshot = CohortSnapshot(str(tmp_path))
+
+    assert average_quiz_score_by_course(snapshot) == {"ml_basics": 70.0}
+    assert goal_completion_rate(snapshot) == {"skill": 0.5}
+    # Unrated feedback is ignored
+    assert top_rated_resources(snapshot) == [("ml_basics", 4.0, 1)]
+
+
+def test_incremental_update_only_reencodes_changed_sessions(tmp_path):
+    update_snapshot(str(tmp_path), [("a", _state(60)), ("b", _state(80))])
+    result = update_snapshot(str(tmp_path), [("a", _state(60)), ("b", _state(100))])
+
+    assert result["updated_students"] == 1
+    assert average_quiz_score_by_course(CohortSnapshot(str(tmp_path))) == {"ml_basics": 80.0}
+
+
+def test_full_run_drops_missing_sessions(tmp_path):
+    update_snapshot(str(tmp_path), [("a", _state(60)), ("b", _state(80))])
+    result = update_snapshot(str(tmp_path), [("a", _state(60))], full=True)
+
+    assert result == {"status": "success", "students": 1, "updated_students": 0, "removed_students": 1}
+    assert average_quiz_score_by_course(CohortSnapshot(str(tmp_path))) == {"ml_basics": 60.0}
+
+
+def test_removed_sessions_are_dropped_and_can_return(tmp_path):
+    update_snapshot(str(tmp_path), [("a", _state(60)), ("b", _state(80))])
+    update_snapshot(str(tmp_path), [], removed_sessions=["b"])
+    assert average_quiz_score_by_course(CohortSnapshot(str(tmp_path))) == {"ml_basics": 60.0}
+
+    update_snapshot(str(tmp_path), [("b", _state(100))])
+    assert average_quiz_score_by_course(CohortSnapshot(str(tmp_path))) == {"ml_basics": 80.0}
+
+
+def test_non_numeric_progress_and_rating_are_skipped(tmp_path):
+    state = _state(60)
+    state["learning_goals"].append({"id": "g2", "type": "skill", "status": "completed", "progress": "50%"})
+    state["feedback_list"].append({"item_id": "ml_basics", "type": "course", "rating": "five"})
+    update_snapshot(str(tmp_path), [("a", state)])
+    snapshot = CohortSnapshot(str(tmp_path))
+
+    assert goal_completion_rate(snapshot) == {"skill": 0.0}
+    assert top_rated_resources(snapshot) == [("ml_basics", 4.0, 1)]
+
+
+def test_updates_publish_new_generations(tmp_path):
+    update_snapshot(str(tmp_path), [("a", _state(60))])
+    reader = CohortSnapshot(str(tmp_path))
+    update_snapshot(str(tmp_path), [("a", _state(60)), ("b", _state(80))])
+
+    # A reader opened before the update keeps a consistent view of its generation
+    assert average_quiz_score_by_course(reader) == {"ml_basics": 60.0}
+    assert average_quiz_score_by_course(CohortSnapshot(str(tmp_path))) == {"ml_basics": 70.0}
+
+    update_snapshot(str(tmp_path), [("a", _state(100)), ("b", _state(80))])
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_dir()) == ["gen-000002", "gen-000003"]
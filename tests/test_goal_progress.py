@@ -0,0 +1,95 @@
+import asyncio
+
+from google.adk.sessions import InMemorySessionService
+
+from learning_assistant_agent.goal_progress import (
+    commit_learning_event,
+    ingest_learning_event,
+    record_quiz_result,
+    register_goal,
+)
+from learning_assistant_agent.state_concurrency import VersionedStateStore, sync_state
+from learning_assistant_agent.state_events import EventStoreSessionService, StateEventStore, event_store_key
+
+
+def _state_with_goal():
+    state = {"learning_goals": [], "interaction_history": [], "completed_courses": []}
+    goal = {"id": "g1", "status": "active", "progress": 0, "related_subjects": ["ml_basics"]}
+    state["learning_goals"] = [register_goal(state, goal)]
+    return state
+
+
+def test_event_progress_survives_sync():
+    store = VersionedStateStore()
+    state = _state_with_goal()
+    sync_state(store, "s1", state)
+
+    result, state_delta = commit_learning_event(
+        "s1", state, {"type": "course_completion", "course_id": "ml_basics"}, store=store
+    )
+    assert result["updated_goals"] == ["g1"]
+    state.update(state_delta)
+    sync_state(store, "s1", state)
+
+    assert state["learning_goals"][0]["progress"] == 100
+    assert state["completed_courses"] == ["ml_basics"]
+    assert store.get("s1", "learning_goals")[0][0]["status"] == "completed"
+
+
+def test_dict_quiz_results_are_converted_not_dropped():
+    state = {"quiz_results": {"ml_basics": 80}, "learning_goals": []}
+    record_quiz_result(state, {"course_id": "python_intro", "score": 60})
+
+    assert [(result["course_id"], result["score"]) for result in state["quiz_results"]] == [
+        ("ml_basics", 80), ("python_intro", 60),
+    ]
+    assert state["subject_quiz_scores"]["python"] == {"total": 140, "count": 2}
+
+
+def test_ingest_learning_event_updates_session(tmp_path):
+    session_service = EventStoreSessionService(InMemorySessionService(), StateEventStore(str(tmp_path)))
+
+    async def run():
+        session = await session_service.create_session(
+            app_name="app", user_id="ingest-student", state=_state_with_goal()
+        )
+        result = await ingest_learning_event(
+            session_service, "app", "ingest-student", session.id,
+            {"type": "quiz_result", "course_id": "ml_basics", "score": 90},
+        )
+        return result, await session_service.get_session(
+            app_name="app", user_id="ingest-student", session_id=session.id
+        )
+
+    result, session = asyncio.run(run())
+    assert result["status"] == "success"
+    assert session.state["learning_goals"][0]["progress"] == 90
+    resumed = StateEventStore(str(tmp_path)).resume(event_store_key("app", "ingest-student", session.id))
+    assert resumed["learning_goals"][0]["progress"] == 90
+
+
+def test_existing_quiz_results_count_towards_mastery():
+    goal = {"id": "g1", "status": "active", "progress": 0, "related_subjects": ["ml_basics"]}
+    listed = {"quiz_results": [{"course_id": "ml_basics", "topic": "", "score": 70}], "learning_goals": []}
+    assert register_goal(listed, goal)["progress"] == 70
+
+    keyed = {"quiz_results": {"ml_basics": {"percentage": 90}}, "learning_goals": []}
+    assert register_goal(keyed, goal)["progress"] == 90
+
+    record_quiz_result(listed, {"course_id": "ml_basics", "score": 90})
+    assert listed["subject_quiz_scores"]["ml_basics"] == {"total": 160, "count": 2}
+
+
+def test_only_resolved_subjects_derive_progress():
+    state = {"learning_goals": [], "completed_courses": ["ml_basics"]}
+    unresolved = register_goal(state, {"id": "g1", "progress": 0, "related_subjects": ["neural networks"]})
+    assert "progress_source" not in unresolved
+    assert unresolved["progress"] == 0
+
+    mixed = register_goal(state, {"id": "g2", "progress": 0, "related_subjects": ["ml_basics", "neural networks"]})
+    assert (mixed["progress"], mixed["progress_source"]) == (100, "derived")
+
+    state["learning_goals"] = [{**unresolved, "status": "active"}]
+    result = record_quiz_result(state, {"topic": "Neural Networks", "score": 40})
+    assert result["updated_goals"] == ["g1"]
+    assert state["learning_goals"][0]["progress"] == 40
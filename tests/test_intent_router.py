@@ -0,0 +1,72 @@
+import pytest
+
+from learning_assistant_agent.intent_router import IntentRouter, evaluate_router
+
+
+@pytest.mark.parametrize("message", [
+    "Can you review this proof for me?",
+    "Explain the trend line in linear regression",
+    "Is recursion harder than loops?",
+    "What is the deadline for the python course?",
+])
+def test_single_keyword_is_not_routed_locally(message):
+    assert IntentRouter().route(message) is None
+
+
+def test_several_keywords_for_one_agent_are_routed_locally():
+    assert IntentRouter().route("This is too hard, can we slow down the pace?") == "adaptive_learning"
+
+
+def test_competing_keywords_fall_back_to_llm():
+    assert IntentRouter().route("I want feedback on my goal and a new goal milestone, it was too hard") is None
+
+
+def test_trained_router_routes_seen_intents():
+    router = IntentRouter()
+    router.train([
+        {"message": "set a goal for python", "agent": "goal_setting"},
+        {"message": "recommend a course on data science", "agent": "content_curator"},
+    ] * 10)
+
+    assert router.route("recommend a course on python") == "content_curator"
+
+
+def test_trained_router_keeps_direct_answers_at_the_root():
+    router = IntentRouter()
+    router.train([
+        {"message": "this python course is too hard, make it easier", "agent": "adaptive_learning"},
+        {"message": "the pace is too fast, slow down", "agent": "adaptive_learning"},
+        {"message": "set a goal to learn python", "agent": "goal_setting"},
+        {"message": "hi there", "agent": None},
+        {"message": "is python a good first language", "agent": "learning_assistant"},
+        {"message": "what is python", "agent": None},
+    ] * 10)
+
+    assert router.route("is python hard") is None
+    assert router.route("hello") is None
+    assert router.route("this course is too hard, make it easier") == "adaptive_learning"
+
+
+class _FixedRouter:
+    def __init__(self, routes):
+        self.routes = routes
+
+    def route(self, message):
+        return self.routes.get(message)
+
+
+def test_evaluate_router_charges_misroutes():
+    router = _FixedRouter({"a": "goal_setting", "b": "feedback"})
+    replay = [
+        {"message": "a", "agent": "goal_setting", "llm_latency_ms": 500},
+        {"message": "b", "agent": "goal_setting", "llm_latency_ms": 500},
+        {"message": "c", "agent": "goal_setting", "llm_latency_ms": 500},
+    ]
+
+    report = evaluate_router(router, replay, misroute_penalty_ms=300)
+
+    assert report["routed_locally"] == 2
+    assert report["misrouted"] == 1
+    assert report["local_accuracy"] == 0.5
+    # 500 saved by the correct route, 300 lost to the misroute, minus router time
+    assert 199 < report["latency_saved_ms"] <= 200
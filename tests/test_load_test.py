@@ -0,0 +1,162 @@
+import asyncio
+import copy
+
+from google.adk.models import LlmRequest
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from learning_assistant_agent.agent import root_agent
+from learning_assistant_agent.load_test import (
+    INITIAL_STUDENT_STATE,
+    SCENARIOS,
+    LatencyDistribution,
+    RecordReplayLlm,
+    ScriptedLlm,
+    _percentile,
+    _request_key,
+    install_stand_in_model,
+    run_load_test,
+)
+
+NO_LATENCY = LatencyDistribution(0, 0)
+PARALLEL_SCENARIO = next(scenario for scenario in SCENARIOS if "calls" in scenario)
+
+
+def _request(*contents):
+    return LlmRequest(contents=list(contents))
+
+
+def _student(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def _tool_turn(name, call_id, result):
+    call = types.Content(role="model", parts=[
+        types.Part(function_call=types.FunctionCall(id=call_id, name=name, args={}))
+    ])
+    response = types.Content(role="user", parts=[
+        types.Part(function_response=types.FunctionResponse(id=call_id, name=name, response=result))
+    ])
+    return call, response
+
+
+def _generate(model, request):
+    async def run():
+        return [response async for response in model.generate_content_async(request)]
+
+    return asyncio.run(run())
+
+
+def _function_calls(responses):
+    return [
+        (part.function_call.name, part.function_call.args)
+        for response in responses
+        for part in response.content.parts
+        if part.function_call
+    ]
+
+
+def _scripted(agent_name):
+    return ScriptedLlm(model="scripted", agent_name=agent_name, latency=NO_LATENCY)
+
+
+def test_percentile_picks_nearest_rank():
+    values = [10, 20, 30, 40, 50]
+    assert _percentile([], 95) == 0.0
+    assert _percentile(values, 0) == 10
+    assert _percentile(values, 50) == 30
+    assert _percentile(values, 100) == 50
+    assert _percentile([7], 99) == 7
+
+
+def test_scripted_model_transfers_calls_tool_then_answers():
+    scenario = SCENARIOS[0]
+    request = _request(_student(scenario["message"]))
+
+    assert _function_calls(_generate(_scripted("learning_assistant"), request)) == [
+        ("transfer_to_agent", {"agent_name": scenario["agent"]})
+    ]
+    assert _function_calls(_generate(_scripted(scenario["agent"]), request)) == [
+        (scenario["tool"], scenario["args"])
+    ]
+
+    answered = _request(_student(scenario["message"]), *_tool_turn(scenario["tool"], "call-1", {"status": "success"}))
+    responses = _generate(_scripted(scenario["agent"]), answered)
+    assert _function_calls(responses) == []
+    assert responses[0].content.parts[0].text == f"Done: {scenario['tool']}"
+
+
+def test_scripted_model_emits_parallel_calls_in_one_response():
+    responses = _generate(_scripted(PARALLEL_SCENARIO["agent"]), _request(_student(PARALLEL_SCENARIO["message"])))
+
+    assert len(responses) == 1
+    assert _function_calls(responses) == [(call["tool"], call["args"]) for call in PARALLEL_SCENARIO["calls"]]
+
+
+def test_record_then_replay_ignores_call_ids(tmp_path):
+    recording = str(tmp_path / "recording.jsonl")
+    scenario = SCENARIOS[0]
+    first = _request(_student(scenario["message"]), *_tool_turn(scenario["tool"], "call-1", {"status": "success"}))
+    second = _request(_student(scenario["message"]), *_tool_turn(scenario["tool"], "call-2", {"status": "ok"}))
+    assert _request_key(first) == _request_key(second)
+    assert _request_key(first) != _request_key(_request(_student(SCENARIOS[1]["message"])))
+
+    recorder = RecordReplayLlm(model="replay", recording_path=recording, inner=_scripted(scenario["agent"]))
+    recorded = _generate(recorder, first)
+
+    replayer = RecordReplayLlm(model="replay", recording_path=recording)
+    replayed = _generate(replayer, second)
+    assert [response.content.parts[0].text for response in replayed] == [
+        response.content.parts[0].text for response in recorded
+    ]
+
+
+def test_small_load_test_reports_no_failures_and_restores_models():
+    original_models = [root_agent.model] + [agent.model for agent in root_agent.sub_agents]
+
+    report = asyncio.run(run_load_test(
+        root_agent, students=2, turns_per_student=2, concurrency=2, latency=NO_LATENCY
+    ))
+
+    assert report["turns"] == 4
+    assert report["failed_turns"] == 0
+    assert report["tool_error_rate"] == 0.0
+    assert report["model_calls"] > 0
+    assert report["turn_latency_ms"]["p50"] <= report["turn_latency_ms"]["max"]
+    assert [root_agent.model] + [agent.model for agent in root_agent.sub_agents] == original_models
+
+
+def test_parallel_tool_calls_merge_their_state():
+    _, restore_models = install_stand_in_model(root_agent, _scripted)
+    session_service = InMemorySessionService()
+
+    async def run():
+        runner = Runner(agent=root_agent, app_name="load_test_parallel", session_service=session_service)
+        session = await session_service.create_session(
+            app_name=runner.app_name, user_id="parallel_student",
+            state={**copy.deepcopy(INITIAL_STUDENT_STATE), "student_name": "Ada"},
+        )
+        tool_results = []
+        async for event in runner.run_async(
+            user_id="parallel_student", session_id=session.id, new_message=_student(PARALLEL_SCENARIO["message"])
+        ):
+            tool_results.extend(
+                (response.name, response.response["status"])
+                for response in event.get_function_responses()
+                if response.name != "transfer_to_agent"
+            )
+        final = await session_service.get_session(
+            app_name=runner.app_name, user_id="parallel_student", session_id=session.id
+        )
+        return tool_results, final.state
+
+    try:
+        tool_results, state = asyncio.run(run())
+    finally:
+        restore_models()
+
+    assert sorted(tool_results) == [("adjust_content_difficulty", "success"), ("adjust_learning_pace", "success")]
+    assert state["difficulty_preferences"] == {"ml_basics": "easier"}
+    assert state["pace_preferences"] == {"ml_basics": "slower"}
+    assert sorted(item["action"] for item in state["interaction_history"]) == ["adjust_difficulty", "adjust_pace"]
@@ -0,0 +1,201 @@
+from types import SimpleNamespace
+
+import pytest
+
+from learning_assistant_agent import state_concurrency
+from learning_assistant_agent.state_concurrency import (
+    STATE_VERSIONS_KEY,
+    VersionConflict,
+    VersionedStateStore,
+    make_concurrency_callbacks,
+    merge_values,
+    sync_state,
+)
+
+SESSION = ("app", "u1", "s1")
+
+
+def _tool_context(state, call_id, session_id="s1"):
+    return SimpleNamespace(
+        state=state,
+        session=SimpleNamespace(app_name="app", user_id="u1", id=session_id),
+        function_call_id=call_id,
+        actions=SimpleNamespace(state_delta={}),
+    )
+
+
+def test_merge_lists_replays_edits_and_appends():
+    assert merge_values([1], [1, 2], [1, 3]) == [1, 3, 2]
+    assert merge_values([1, 2], [1, 5], [1, 2, 3]) == [1, 5, 3]
+    # Both sides edited the same item, or items were removed
+    assert merge_values([1, 2], [1, 5], [1, 6]) is None
+    assert merge_values([1, 2], [2], [1, 2, 3]) is None
+
+
+def test_merge_dicts_combines_disjoint_keys_and_flags_conflicts():
+    assert merge_values({"a": 1}, {"a": 1, "b": 2}, {"a": 1, "c": 3}) == {"a": 1, "b": 2, "c": 3}
+    assert merge_values({"a": 1}, {"a": 2}, {"a": 3}) is None
+
+
+def test_parallel_goals_on_the_same_subject_merge_the_index():
+    store = VersionedStateStore()
+    store.seed("s1", {"goal_subject_index": {"python": ["g0"]}})
+    store.commit("s1", "goal_subject_index", 1, {"python": ["g0", "g1"], "machine learning": ["g1"]})
+
+    merged, _ = store.commit("s1", "goal_subject_index", 1, {"python": ["g0", "g2"], "machine learning": ["g2"]})
+    assert merged == {"python": ["g0", "g1", "g2"], "machine learning": ["g1", "g2"]}
+    with pytest.raises(VersionConflict):
+        store.commit("s1", "goal_subject_index", 1, {"python": []})
+
+
+def test_commit_paths():
+    store = VersionedStateStore()
+    assert store.commit("s1", "learning_goals", 0, [1]) == ([1], 1)
+    # Same version and value: no new version
+    assert store.commit("s1", "learning_goals", 1, [1]) == ([1], 1)
+    # Stale writer is merged against the version it read
+    store.commit("s1", "learning_goals", 1, [1, 2])
+    assert store.commit("s1", "learning_goals", 1, [1, 3]) == ([1, 2, 3], 3)
+
+    store.commit("s1", "pace_preferences", 0, {"pace": "slow"})
+    store.commit("s1", "pace_preferences", 1, {"pace": "fast"})
+    with pytest.raises(VersionConflict):
+        store.commit("s1", "pace_preferences", 1, {"pace": "medium"})
+    # Keys outside MERGEABLE_KEYS never merge
+    store.commit("s1", "current_level", 0, "beginner")
+    store.commit("s1", "current_level", 1, "advanced")
+    with pytest.raises(VersionConflict):
+        store.commit("s1", "current_level", 1, "expert")
+
+
+def test_commit_many_writes_nothing_when_any_key_conflicts():
+    store = VersionedStateStore()
+    store.seed("s1", {"interaction_history": [], "pace_preferences": {"pace": "slow"}})
+    store.commit("s1", "pace_preferences", 1, {"pace": "fast"})
+
+    with pytest.raises(VersionConflict):
+        store.commit_many(
+            "s1",
+            {"interaction_history": 1, "pace_preferences": 1},
+            {"interaction_history": ["changed pace"], "pace_preferences": {"pace": "medium"}},
+        )
+    assert store.get("s1", "interaction_history") == ([], 1)
+
+
+def test_failed_commit_can_be_retried_without_duplicates():
+    store = VersionedStateStore()
+    guard, commit, _ = make_concurrency_callbacks(store)
+    state = {"interaction_history": [], "pace_preferences": {"pace": "slow"}}
+
+    context = _tool_context(dict(state), "call-1")
+    guard(None, {}, context)
+    store.commit(SESSION, "pace_preferences", 1, {"pace": "fast"})
+    context.actions.state_delta.update(
+        interaction_history=["changed pace"], pace_preferences={"pace": "medium"}
+    )
+    assert commit(None, {}, context, {})["status"] == "error"
+    assert context.actions.state_delta == {}
+
+    retry = _tool_context({"interaction_history": [], "pace_preferences": {"pace": "fast"}}, "call-2")
+    guard(None, {}, retry)
+    retry.actions.state_delta.update(
+        interaction_history=["changed pace"], pace_preferences={"pace": "medium"}
+    )
+    assert commit(None, {}, retry, {}) is None
+    assert store.get(SESSION, "interaction_history")[0] == ["changed pace"]
+    assert retry.actions.state_delta[STATE_VERSIONS_KEY]["interaction_history"] == 2
+
+
+def test_history_is_capped_by_items(monkeypatch):
+    monkeypatch.setattr(state_concurrency, "HISTORY_MAX_ITEMS", 10)
+    store = VersionedStateStore()
+    for version in range(8):
+        store.commit("s1", "interaction_history", version, list(range(version + 1)))
+
+    history = store._history["s1"]["interaction_history"]
+    assert sum(len(value) for value in history.values()) <= 10
+    assert 8 in history
+
+
+def test_stale_appends_merge_once_the_full_base_is_gone():
+    store = VersionedStateStore()
+    history = [{"action": "add_goal", "step": step} for step in range(2100)]
+    store.commit("s1", "interaction_history", 0, history)
+
+    store.commit("s1", "interaction_history", 1, history + ["a"])
+    merged, _ = store.commit("s1", "interaction_history", 1, history + ["b"])
+    assert merged[-2:] == ["a", "b"]
+    assert 1 not in store._history["s1"]["interaction_history"]
+
+    # In-place edits still need the full base
+    edited = [{"action": "edited"}] + history[1:]
+    with pytest.raises(VersionConflict):
+        store.commit("s1", "interaction_history", 1, edited)
+
+
+def test_idle_sessions_are_evicted_with_their_locks():
+    store = VersionedStateStore(idle_ttl=0.0)
+    store.seed("s1", {"learning_goals": [1]})
+    assert store.evict_idle(force=True) == 1
+    assert store.lock_manager._locks == {}
+    assert store.get("s1", "learning_goals") == (None, 0)
+
+    store.seed("s1", {"learning_goals": [1]})
+    assert store.get("s1", "learning_goals") == ([1], 1)
+    # Sessions in use are kept
+    with store.lock_manager.lock("s1"):
+        assert store.evict_idle(force=True) == 0
+
+
+def test_reseeding_from_a_stale_copy_keeps_the_newer_session():
+    store = VersionedStateStore(idle_ttl=0.0)
+    live = {"learning_goals": [1]}
+    sync_state(store, SESSION, live)
+    store.commit(SESSION, "learning_goals", 1, [1, 2])
+    store.commit(SESSION, "learning_goals", 2, [1, 2, 3])
+    sync_state(store, SESSION, live)
+    stale = {"learning_goals": [1], STATE_VERSIONS_KEY: {"learning_goals": 1}}
+
+    store.evict_idle(force=True)
+    sync_state(store, SESSION, stale)
+    sync_state(store, SESSION, live)
+    assert live["learning_goals"] == [1, 2, 3]
+    sync_state(store, SESSION, stale)
+    assert stale["learning_goals"] == [1, 2, 3]
+
+
+def test_sessions_of_the_same_user_are_kept_apart():
+    store = VersionedStateStore()
+    guard, _, _ = make_concurrency_callbacks(store)
+    guard(None, {}, _tool_context({"learning_goals": ["from a"]}, "call-1", session_id="a"))
+
+    session_b = {"learning_goals": []}
+    guard(None, {}, _tool_context(session_b, "call-2", session_id="b"))
+    assert session_b["learning_goals"] == []
+
+
+def test_guard_reads_versions_without_copying_values(monkeypatch):
+    store = VersionedStateStore()
+    guard, _, _ = make_concurrency_callbacks(store)
+    state = {"learning_goals": [1]}
+    guard(None, {}, _tool_context(state, "call-1"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("values were copied")
+
+    monkeypatch.setattr(store, "get", fail)
+    guard(None, {}, _tool_context(state, "call-2"))
+
+
+def test_tool_errors_release_in_flight_versions():
+    store = VersionedStateStore()
+    guard, commit, release = make_concurrency_callbacks(store)
+    in_flight = next(
+        cell.cell_contents for cell in guard.__closure__ if isinstance(cell.cell_contents, dict)
+    )
+
+    context = _tool_context({"learning_goals": []}, "call-1")
+    guard(None, {}, context)
+    assert len(in_flight) == 1
+    release(None, {}, context, RuntimeError("tool failed"))
+    assert in_flight == {}
@@ -0,0 +1,117 @@
+import asyncio
+import copy
+
+import pytest
+from google.genai import types
+
+from learning_assistant_agent.state_events import (
+    EventStoreSessionService,
+    StateEventStore,
+    apply_ops,
+    diff_state,
+    event_store_key,
+)
+
+
+@pytest.mark.parametrize("old, new", [
+    ({}, {"learning_goals": [{"id": "g1", "progress": 0}]}),
+    ({"learning_goals": [{"id": "g1", "progress": 0}]}, {"learning_goals": [{"id": "g1", "progress": 50}, {"id": "g2"}]}),
+    ({"learning_goals": [{"id": "g1", "note": "x"}]}, {"learning_goals": [{"id": "g1"}]}),
+    ({"interaction_history": [1, 2, 3]}, {"interaction_history": [1]}),
+    ({"difficulty_preferences": {"ml": "easier", "py": "harder"}}, {"difficulty_preferences": {"ml": "harder"}}),
+    ({"student_name": "A"}, {"student_name": "B", "learning_style": "visual"}),
+])
+def test_diff_and_apply_round_trip(old, new):
+    ops = diff_state(old, new)
+    assert apply_ops(copy.deepcopy(old), ops) == {**old, **new}
+
+
+def test_append_and_progress_update_are_small_ops():
+    old = {"learning_goals": [{"id": "g1", "title": "ML", "progress": 0}], "interaction_history": [{"a": 1}]}
+    new = {
+        "learning_goals": [{"id": "g1", "title": "ML", "progress": 50}],
+        "interaction_history": [{"a": 1}, {"a": 2}],
+    }
+
+    assert diff_state(old, new) == [
+        {"op": "update_item", "index": 0, "fields": {"progress": 50}, "key": "learning_goals"},
+        {"op": "append", "key": "interaction_history", "items": [{"a": 2}]},
+    ]
+
+
+def test_resume_from_snapshot_and_tail(tmp_path):
+    store = StateEventStore(str(tmp_path), snapshot_every=3)
+    history = []
+    for step in range(7):
+        history = history + [step]
+        store.record("s1", {"interaction_history": history})
+
+    resumed_store = StateEventStore(str(tmp_path))
+    assert resumed_store.resume("s1") == {"interaction_history": list(range(7))}
+    assert resumed_store.tail_lengths["s1"] == 1
+
+
+def test_evicted_sessions_resume_from_disk(tmp_path):
+    store = StateEventStore(str(tmp_path), max_cached_sessions=1)
+    store.record("s1", {"learning_goals": [1]})
+    store.record("s2", {"learning_goals": [2]})
+    assert list(store.states) == ["s2"]
+
+    store.record("s1", {"learning_goals": [1, 3]})
+    assert store.resume("s1") == {"learning_goals": [1, 3]}
+
+
+def test_file_names_are_hashed_session_keys(tmp_path):
+    store = StateEventStore(str(tmp_path / "events"))
+    store.record(event_store_key("app", "u1", "../x"), {"learning_goals": [1]})
+    store.record(event_store_key("app", "u2", "../x"), {"learning_goals": [2]})
+
+    assert not (tmp_path / "x.log.jsonl").exists()
+    assert len(list((tmp_path / "events").iterdir())) == 2
+    assert StateEventStore(store.directory).resume(event_store_key("app", "u1", "../x")) == {"learning_goals": [1]}
+
+
+def test_agent_sessions_persist_state_as_operations(tmp_path):
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from learning_assistant_agent.agent import root_agent
+    from learning_assistant_agent.load_test import (
+        INITIAL_STUDENT_STATE, SCENARIOS, LatencyDistribution, ScriptedLlm, install_stand_in_model,
+    )
+
+    latency = LatencyDistribution(0, 0)
+    _, restore_models = install_stand_in_model(
+        root_agent, lambda name: ScriptedLlm(model="scripted", agent_name=name, latency=latency)
+    )
+    inner = InMemorySessionService()
+    session_service = EventStoreSessionService(inner, StateEventStore(str(tmp_path)))
+
+    async def run():
+        runner = Runner(agent=root_agent, app_name="state_events_test", session_service=session_service)
+        state = {**copy.deepcopy(INITIAL_STUDENT_STATE), "student_name": "Ada"}
+        session = await session_service.create_session(
+            app_name=runner.app_name, user_id="resume_student", state=state
+        )
+        for scenario in SCENARIOS[:3]:
+            message = types.Content(role="user", parts=[types.Part(text=scenario["message"])])
+            async for _ in runner.run_async(user_id="resume_student", session_id=session.id, new_message=message):
+                pass
+        resumed = await session_service.get_session(
+            app_name=runner.app_name, user_id="resume_student", session_id=session.id
+        )
+        stored = await inner.get_session(app_name=runner.app_name, user_id="resume_student", session_id=session.id)
+        return resumed, stored
+
+    try:
+        session, stored = asyncio.run(run())
+    finally:
+        restore_models()
+
+    assert session.state["student_name"] == "Ada"
+    assert len(session.state["learning_goals"]) == 1
+    assert len(session.state["interaction_history"]) == 3
+    # Events kept by the wrapped service no longer carry whole collections
+    assert not any(event.actions.state_delta.get("interaction_history") for event in stored.events)
+    key = event_store_key("state_events_test", "resume_student", session.id)
+    assert StateEventStore(str(tmp_path)).resume(key) == session.state